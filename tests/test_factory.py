@@ -42,3 +42,21 @@ class TestFactory(TestCase):
 
         locked_nested_graph_cls = self.factory.get_predefined(nested=True, locked=True, graph=True)
         self.assertNotEqual(locked_nested_graph_cls._create_event, graph_cls._create_event)
+
+    def test_locked_method_references(self):
+        for nested in (False, True):
+            machine_cls = self.factory.get_predefined(graph=True, nested=nested, locked=True)
+            m = machine_cls(states=['A', 'B'], initial='A', graph_engine='mermaid')
+            self.assertEqual("get_triggers()", machine_cls.format_references(m.get_triggers))
+
+    def test_overridden_locked_method_references(self):
+        for nested in (False, True):
+            base_cls = self.factory.get_predefined(graph=True, nested=nested, locked=True)
+
+            class CustomLockedMachine(base_cls):  # type: ignore
+
+                def _locked_method(self, func, *args, **kwargs):
+                    return super(CustomLockedMachine, self)._locked_method(func, *args, **kwargs)
+
+            m = CustomLockedMachine(states=['A', 'B'], initial='A', graph_engine='mermaid')
+            self.assertEqual("get_triggers()", CustomLockedMachine.format_references(m.get_triggers))
@@ -6,6 +6,7 @@ from transitions.extensions import (
 )
 from transitions.extensions.states import add_state_features, Timeout, Tags
 from unittest import skipIf
+import copy
 import tempfile
 import os
 import re
@@ -220,6 +221,22 @@ class TestDiagrams(TestTransitions):
         self.assertEqual(len(edges), 3)  # to_state_{A,C,F}
         self.assertEqual(len(nodes), 5)  # B + A,C,F (edges) + E (previous)
 
+    def test_update_restyled_graph(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        m.walk()
+        dot, _, _ = self.parse_dot(m.get_graph())
+        if self.graph_engine == "graphviz":
+            # graphs derived from an unstyled graph must not differ from graphs built from scratch
+            self.assertEqual(dot, m.model_graphs[id(m)]._build_graph(m.title, None).source)
+
+    def test_roi_internal(self):
+        m = self.machine_cls(states=['A', 'B'], transitions=[['go', 'A', 'B'], ['internal', 'B', None]],
+                             initial='A', graph_engine=self.graph_engine)
+        _, nodes, edges = self.parse_dot(m.get_graph(show_roi=True))
+        self.assertEqual(1, len(edges))
+        self.assertEqual({'A', 'B'}, nodes)
+
     def test_state_tags(self):
 
         @add_state_features(Tags, Timeout)
@@ -264,6 +281,86 @@ class TestDiagrams(TestTransitions):
         self.assertEqual(b2, b1.getvalue())
         b1.close()
 
+    def test_roi_cache(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        g1 = m.get_graph(show_roi=True)
+        self.assertEqual(self.parse_dot(g1), self.parse_dot(m.get_graph(show_roi=True)))
+        m.walk()
+        g2 = m.get_graph(show_roi=True)
+        self.assertIsNot(g1, g2)
+        _, nodes, _ = self.parse_dot(g2)
+        self.assertIn('C', nodes)
+
+    def test_graph_copies(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        # pygraphviz returns the styled graph itself when no region of interest is requested
+        for show_roi in (True,) if self.graph_engine == "pygraphviz" else (False, True):
+            graph = m.get_graph(show_roi=show_roi)
+            if self.graph_engine == "pygraphviz":
+                graph.graph_attr['label'] = 'mutated'
+            elif self.graph_engine == "mermaid":
+                graph.source = 'mutated'
+            else:
+                graph.attr(label='mutated')
+            # changes of a returned graph must not be part of graphs returned later
+            self.assertNotIn('mutated', self.parse_dot(m.get_graph(show_roi=show_roi))[0])
+
+    def test_roi_all_states(self):
+        m = self.machine_cls(states=['A'], initial='A', auto_transitions=False, graph_engine=self.graph_engine)
+        m.add_transition('loop', 'A', 'A')
+        # the only state is part of the region of interest
+        self.assertEqual(self.parse_dot(m.get_graph(show_roi=True)), self.parse_dot(m.get_graph()))
+        # the complete graph must not be returned as region of interest since callers may alter it
+        self.assertIsNot(m.get_graph(show_roi=True), m.get_graph())
+
+    def test_fast_layout(self):
+        if self.graph_engine == "mermaid":
+            self.skipTest("mermaid diagrams have no layout attributes")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine, fast_layout=True)
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertIn("splines=line", dot)
+        self.assertIn("ranksep=0.25", dot)
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertNotIn("splines", dot)
+
+    def test_draw_states(self):
+        if self.graph_engine != "graphviz":
+            self.skipTest("draw_states is only supported by the graphviz backend")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        m.walk()
+        dot, _, _ = self.parse_dot(m.get_graph())
+        diagrams = m.model_graphs[id(m)].draw_states(format='svg', max_workers=2)
+        self.assertEqual(set(diagrams.keys()), set(m.get_nested_state_names()
+                                                   if hasattr(m, 'get_nested_state_names') else m.states))
+        self.assertTrue(all(diagram.startswith(b'<?xml') for diagram in diagrams.values()))
+        # styling of the current graph must not be altered
+        self.assertEqual(dot, self.parse_dot(m.get_graph())[0])
+
+    def test_pipe_cache(self):
+        if self.graph_engine != "graphviz":
+            self.skipTest("rendered output is only cached by the graphviz backend")
+        try:
+            from unittest import mock  # will raise an ImportError in Python 2.7
+        except ImportError:
+            self.skipTest("test requires unittest.mock")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        graph = m.model_graphs[id(m)]
+        with mock.patch.object(pgv.Digraph, 'pipe', return_value=b'diagram') as pipe:
+            m.get_graph().draw(None, format='png')
+            m.get_graph().draw(None, format='png')
+            self.assertEqual(1, pipe.call_count)
+            m.get_graph(title='other').draw(None, format='png')
+            self.assertEqual(2, pipe.call_count)
+        # only the most recent rendering is kept
+        self.assertEqual(1, len(graph._pipe_cache))
+
     def test_graphviz_fallback(self):
         try:
             from unittest import mock  # will raise an ImportError in Python 2.7
@@ -298,6 +395,60 @@ class TestDiagrams(TestTransitions):
         assert not any("walk" == t["trigger"] for t in m.markup["transitions"])
         assert "[label=walk]" not in edges
 
+    def test_update_on_callback_change(self):
+        if self.graph_engine == "pygraphviz":
+            self.skipTest("Graphs of pygraphviz are only generated when states or transitions are added")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine, show_state_attributes=True)
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertNotIn("hello", dot)
+        m.on_enter_B('hello')
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertIn("hello", dot)
+        m.show_conditions = True
+        _, _, edges = self.parse_dot(m.get_graph())
+        self.assertTrue(any("[is_fast]" in edge for edge in edges))
+
+    def test_update_on_attribute_change_after_transition(self):
+        if self.graph_engine == "pygraphviz":
+            self.skipTest("Graphs of pygraphviz are only generated when states or transitions are added")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        # class attributes must not be altered
+        m.machine_attributes = copy.deepcopy(m.machine_attributes)
+        m.style_attributes = copy.deepcopy(m.style_attributes)
+        dot, _, _ = self.parse_dot(m.get_graph())
+        m.machine_attributes['ratio'] = '0.3'
+        m.style_attributes['node']['active']['fillcolor'] = 'yellow'  # type: ignore[index]
+        m.walk()
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertIn('0.3', dot)
+        self.assertIn('yellow', dot)
+
+    def test_update_on_attribute_change(self):
+        if self.graph_engine == "pygraphviz":
+            self.skipTest("Graphs of pygraphviz are only generated when states or transitions are added")
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        m.machine_attributes = copy.deepcopy(m.machine_attributes)
+        m.style_attributes = copy.deepcopy(m.style_attributes)
+        self.parse_dot(m.get_graph())
+        self.parse_dot(m.get_graph(show_roi=True))
+        m.machine_attributes['ratio'] = '0.3'
+        m.style_attributes['node']['active']['fillcolor'] = 'yellow'  # type: ignore[index]
+        for show_roi in (False, True):
+            dot, _, _ = self.parse_dot(m.get_graph(show_roi=show_roi))
+            self.assertIn('0.3', dot)
+            self.assertIn('yellow', dot)
+
+    def test_update_on_state_change(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        dot, _, _ = self.parse_dot(m.get_graph())
+        self.assertEqual(dot, self.parse_dot(m.get_graph())[0])
+        m.walk()
+        self.assertNotEqual(dot, self.parse_dot(m.get_graph())[0])
+
 
 @skipIf(pgv is None, 'Graph diagram test requires graphviz')
 class TestDiagramsLocked(TestDiagrams):
@@ -375,6 +526,13 @@ class TestDiagramsNested(TestDiagrams):
         self.assertEqual(len(edges), 2)
         self.assertEqual(len(nodes), 3)
 
+    def test_roi_keeps_markup(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='C_1_a',
+                             graph_engine=self.graph_engine)
+        markup = copy.deepcopy(m.get_markup_config())
+        _ = m.get_graph(show_roi=True)
+        self.assertEqual(markup, m.get_markup_config())
+
     def test_roi_parallel(self):
         class Model:
             @staticmethod
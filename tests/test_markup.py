@@ -5,7 +5,7 @@ except ImportError:
 
 from functools import partial
 
-from transitions.extensions.markup import MarkupMachine, HierarchicalMarkupMachine, rep
+from transitions.extensions.markup import MarkupMachine, HierarchicalMarkupMachine, rep, _convert
 
 from .test_core import TYPE_CHECKING
 from .utils import Stuff
@@ -92,6 +92,20 @@ class TestRep(TestCase):
         self.assertTrue(ccheck())
         self.assertEqual(rep(ccheck, MarkupMachine.format_references), "Check(True)")
 
+    def test_convert_getitem_sequence(self):
+        class GetItemSequence(object):
+            # iterable through __getitem__ only
+            def __getitem__(self, index):
+                if index > 1:
+                    raise IndexError
+                return "tag%d" % index
+
+        class Tagged(object):
+            tags = GetItemSequence()
+
+        self.assertEqual({'tags': ['tag0', 'tag1']},
+                         _convert(Tagged(), ['tags'], MarkupMachine.format_references))
+
 
 class TestMarkupMachine(TestCase):
 
@@ -157,6 +171,14 @@ class TestMarkupMachine(TestCase):
         self.assertEqual(len(m1.markup['transitions']), self.num_trans + self.num_auto)
         self.assertEqual(len(m2.markup['transitions']), self.num_trans)
 
+    def test_machine_callbacks(self):
+        m = self.machine_cls(states=self.states, initial='A', before_state_change='before',
+                             after_state_change=['after', 'after_again'], prepare_event='prepare')
+        markup = m.markup
+        self.assertEqual(['before'], markup['before_state_change'])
+        self.assertEqual(['after', 'after_again'], markup['after_state_change'])
+        self.assertEqual(['prepare'], markup['prepare_event'])
+
 
 class TestMarkupHierarchicalMachine(TestMarkupMachine):
 
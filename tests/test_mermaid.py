@@ -8,6 +8,7 @@ from transitions.extensions import (
 from transitions.extensions.states import add_state_features, Timeout, Tags
 from unittest import skipIf
 import tempfile
+from io import BytesIO
 import os
 import re
 import sys
@@ -135,6 +136,37 @@ class TestMermaidDiagrams(TestDiagrams):
         self.assertEqual(b2, b1.getvalue().decode())
         b1.close()
 
+    def test_roi_keeps_custom_styles(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A', auto_transitions=False,
+                             graph_engine=self.graph_engine)
+        m.walk()
+        styles = m.model_graphs[id(m)].custom_styles
+        edge_styles = {src: dict(dests) for src, dests in styles['edge'].items()}
+        node_styles = dict(styles['node'])
+        _ = m.get_graph(show_roi=True)
+        _ = m.get_graph()
+        self.assertEqual(edge_styles, styles['edge'])
+        self.assertEqual(node_styles, styles['node'])
+
+    def test_file_descriptor(self):
+        m = self.machine_cls(states=['A', 'B', 'C'], initial='A', title='A test', graph_engine=self.graph_engine)
+        g = m.get_graph()
+        with tempfile.TemporaryFile() as target:
+            g.draw(target.fileno())
+            g.draw(target.fileno())
+            target.seek(0)
+            self.assertEqual(target.read().decode(), g.source * 2)
+
+    def test_set_source(self):
+        m = self.machine_cls(states=['A', 'B', 'C'], initial='A', title='A test', graph_engine=self.graph_engine)
+        g = m.get_graph()
+        g.draw(BytesIO())
+        g.source = "stateDiagram-v2"
+        self.assertEqual("stateDiagram-v2", g.draw(None))
+        target = BytesIO()
+        g.draw(target)
+        self.assertEqual(b"stateDiagram-v2", target.getvalue())
+
     def test_update_on_remove_transition(self):
         m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A',
                              graph_engine=self.graph_engine, show_state_attributes=True)
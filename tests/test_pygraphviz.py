@@ -88,6 +88,18 @@ class PygraphvizTest(TestDiagrams):
         self.assertEqual(len(g2.edges()), 4)
         self.assertEqual(len(g2.nodes()), 4)
 
+    def test_roi_follows_graph_edits(self):
+        m = self.machine_cls(states=self.states, transitions=self.transitions, initial='A',
+                             graph_engine=self.graph_engine)
+        self.assertNotEqual(m.get_graph(show_roi=True).get_node('A').attr['fontcolor'], 'red')
+        # the complete graph may be altered directly; regions of interest must reflect these changes
+        graph = m.get_graph()
+        graph.get_node('A').attr['fontcolor'] = 'red'
+        graph.graph_attr['label'] = 'edited'
+        roi = m.get_graph(show_roi=True)
+        self.assertEqual(roi.get_node('A').attr['fontcolor'], 'red')
+        self.assertEqual(roi.graph_attr['label'], 'edited')
+
     def test_state_tags(self):
 
         @add_state_features(Tags, Timeout)
@@ -117,3 +129,10 @@ class PygraphvizTest(TestDiagrams):
 class TestPygraphvizNested(TestDiagramsNested, PygraphvizTest):
 
     graph_engine = "pygraphviz"
+
+    def test_lhead_for_states_sharing_a_prefix(self):
+        states = [{'name': 'A', 'children': ['1', '2'], 'initial': '1'}, 'AB']
+        m = self.machine_cls(states=states, transitions=[['go', 'AB', 'A'], ['back', 'A', 'AB']], initial='AB')
+        g = m.get_graph()
+        self.assertEqual('cluster_A', g.get_edge('AB', 'A').attr['lhead'])
+        self.assertEqual('cluster_A', g.get_edge('A', 'AB').attr['ltail'])
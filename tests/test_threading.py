@@ -13,9 +13,9 @@ from .test_core import TestTransitions, TYPE_CHECKING
 from .utils import Stuff, DummyModel, SomeContext
 
 try:
-    from unittest.mock import MagicMock
+    from unittest.mock import MagicMock, patch
 except ImportError:
-    from mock import MagicMock  # type: ignore
+    from mock import MagicMock, patch  # type: ignore
 
 if TYPE_CHECKING:
     from typing import List, Type, Tuple, Any
@@ -142,6 +142,43 @@ class TestLockedTransitions(TestTransitions):
         self.assertEqual(c.max, 1)  # was 3 before
         self.assertEqual(c.counter, 4)  # was 72 (!) before
 
+    def test_nested(self):
+        from transitions.extensions.locking import nested
+        for count in range(1, 4):
+            event_list = []  # type: List[Tuple[Any, str]]
+            contexts = tuple(SomeContext(event_list=event_list) for _ in range(count))
+            # a single context is yielded as a tuple as well
+            with nested(*contexts) as entered:
+                self.assertEqual(contexts, tuple(entered))
+                self.assertEqual(count, len(event_list))
+            self.assertEqual(2 * count, len(event_list))
+
+    def test_locked_method_reuse(self):
+        m = self.stuff.machine
+        self.assertIs(m.get_triggers, m.get_triggers)
+        m.get_triggers = lambda *args: ['custom']
+        self.assertEqual(['custom'], m.get_triggers('A'))
+        del m.get_triggers
+        self.assertIn('forward', m.get_triggers('A'))
+
+    def test_locked_method_class_patch(self):
+        m = self.stuff.machine
+        self.assertIn('forward', m.get_triggers('A'))
+        with patch.object(self.machine_cls, 'get_triggers', lambda *args: ['patched']):
+            self.assertEqual(['patched'], m.get_triggers('A'))
+        self.assertIn('forward', m.get_triggers('A'))
+
+    def test_locked_class_method_reuse(self):
+
+        class CustomMachine(self.machine_cls):  # type: ignore
+            @classmethod
+            def custom(cls):
+                return cls
+
+        m = CustomMachine(states=['A'], initial='A')
+        self.assertIs(m.custom, m.custom)
+        self.assertIs(CustomMachine, m.custom())
+
     # This test has been used to quantify the changes made in locking in version 0.5.0.
     # See https://github.com/tyarkoni/transitions/issues/167 for the results.
     # def test_performance(self):
@@ -212,6 +249,21 @@ class TestMultipleContexts(TestTransitions):
         self.assertEqual((self.c2, "exit"), self.event_list[-2])
         self.assertEqual((self.c1, "exit"), self.event_list[-1])
 
+    def test_add_model_twice(self):
+        self.stuff.machine.add_model(self.s1, model_context=[self.c3, self.c4])
+        del self.event_list[:]
+        self.s1.forward()
+        self.assertEqual(1, self.event_list.count((self.c3, "enter")))
+
+    def test_unregistered_model(self):
+        model = DummyModel()
+        model.state = 'A'
+        self.stuff.machine.events['forward'].trigger(model)
+        self.assertEqual('B', model.state)
+        self.assertEqual((self.c1, "enter"), self.event_list[0])
+        self.assertEqual((self.c1, "exit"), self.event_list[-1])
+        self.assertNotIn((self.c3, "enter"), self.event_list)
+
 
 # Same as TestLockedTransition but with LockedHierarchicalMachine
 class TestLockedHierarchicalTransitions(TestNestedTransitions, TestLockedTransitions):
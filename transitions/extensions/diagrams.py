@@ -68,6 +68,15 @@ class GraphMachine(MarkupMachine):
         "rankdir": "LR",
     }
 
+    # added to machine_attributes when graphs are generated with 'fast_layout=True'
+    fast_layout_attributes = {
+        "splines": "line",
+        "nslimit": "1",
+        "nslimit1": "1",
+        "mclimit": "1",
+        "ranksep": "0.25",
+    }
+
     style_attributes = {
         "node": {
             "default": {
@@ -118,11 +127,12 @@ class GraphMachine(MarkupMachine):
                  queued=False, prepare_event=None, finalize_event=None, model_attribute='state', model_override=False,
                  on_exception=None, on_final=None, title="State Machine", show_conditions=False,
                  show_state_attributes=False, show_auto_transitions=False,
-                 use_pygraphviz=True, graph_engine="pygraphviz", **kwargs):
+                 use_pygraphviz=True, graph_engine="pygraphviz", fast_layout=False, **kwargs):
         # remove graph config from keywords
         self.title = title
         self.show_conditions = show_conditions
         self.show_state_attributes = show_state_attributes
+        self.fast_layout = fast_layout
         # in MarkupMachine this switch is called 'with_auto_transitions'
         # keep 'auto_transitions_markup' for backwards compatibility
         kwargs["auto_transitions_markup"] = show_auto_transitions
@@ -153,15 +163,15 @@ class GraphMachine(MarkupMachine):
         """Imports diagrams (py)graphviz backend based on machine configuration"""
         is_hsm = issubclass(self.transition_cls, NestedTransition)
         if graph_engine == "pygraphviz":
-            from .diagrams_pygraphviz import Graph, NestedGraph, pgv  # pylint: disable=import-outside-toplevel
-            if pgv:
+            from .diagrams_pygraphviz import Graph, NestedGraph, _get_pgv  # pylint: disable=import-outside-toplevel
+            if _get_pgv():
                 return NestedGraph if is_hsm else Graph
             _LOGGER.warning("Could not import pygraphviz backend. Will try graphviz backend next.")
             graph_engine = "graphviz"
 
         if graph_engine == "graphviz":
-            from .diagrams_graphviz import Graph, NestedGraph, pgv  # pylint: disable=import-outside-toplevel
-            if pgv:
+            from .diagrams_graphviz import Graph, NestedGraph, _get_pgv  # pylint: disable=import-outside-toplevel
+            if _get_pgv():
                 return NestedGraph if is_hsm else Graph
             _LOGGER.warning("Could not import graphviz backend. Fallback to mermaid graphs")
 
@@ -25,11 +25,13 @@ class GraphMachine(MarkupMachine):
     _pickle_blacklist: List[str]
     transition_cls: Type[TransitionGraphSupport]
     machine_attributes: Dict[str, str]
+    fast_layout_attributes: Dict[str, str]
     style_attributes: Dict[str, Union[str, Dict[str, Union[str, Dict[str, Any]]]]]
     model_graphs: Dict[int, BaseGraph]
     title: str
     show_conditions: bool
     show_state_attributes: bool
+    fast_layout: bool
     graph_cls: Type[BaseGraph]
     models: List[GraphModelProtocol]
     def __getstate__(self) -> Dict[str, Any]: ...
@@ -48,7 +50,7 @@ class GraphMachine(MarkupMachine):
                  title: str = ..., show_conditions: bool = ..., show_state_attributes: bool = ...,
                  show_auto_transitions: bool = ..., use_pygraphviz: bool = ...,
                  graph_engine: Union[Literal["pygraphviz"], Literal["graphviz"], Literal["mermaid"]] = ...,
-                 **kwargs: Any) -> None: ...
+                 fast_layout: bool = ..., **kwargs: Any) -> None: ...
     def _init_graphviz_engine(self, graph_engine: str) -> Type[BaseGraph]: ...
     def _get_graph(self, model: GraphModelProtocol, title: Optional[str] = ..., force_new: bool = ...,
                    show_roi: bool = ...) -> GraphProtocol: ...
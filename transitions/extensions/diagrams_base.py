@@ -8,6 +8,8 @@
 import copy
 import abc
 import logging
+from itertools import chain
+
 import six
 
 _LOGGER = logging.getLogger(__name__)
@@ -26,6 +28,15 @@ class BaseGraph(object):
     def __init__(self, machine):
         self.machine = machine
         self.fsm_graph = None
+        # Enum states and scoped state names resolved to their global names;
+        # graphs are recreated when states change
+        self._enum_names = {}
+        self._global_names = {}
+        # names of all (nested) states; resolved on first use
+        self._state_names = None
+        # states and transitions collected by `_update_elements` and the options graphs were generated with
+        self._elements = None
+        self._options = None
         self.generate()
 
     @abc.abstractmethod
@@ -64,36 +75,44 @@ class BaseGraph(object):
 
     def _convert_state_attributes(self, state):
         label = state.get("label", state["name"])
-        if self.machine.show_state_attributes:
-            if "tags" in state:
-                label += " [" + ", ".join(state["tags"]) + "]"
-            if "on_enter" in state:
-                label += r"\l- enter:\l  + " + r"\l  + ".join(state["on_enter"])
-            if "on_exit" in state:
-                label += r"\l- exit:\l  + " + r"\l  + ".join(state["on_exit"])
-            if "timeout" in state:
-                label += r'\l- timeout(' + state['timeout'] + 's) -> (' + ', '.join(state['on_timeout']) + ')'
+        if not self.machine.show_state_attributes:
+            return label + r"\l"
+        parts = [label]
+        if "tags" in state:
+            parts.extend((" [", ", ".join(state["tags"]), "]"))
+        if "on_enter" in state:
+            parts.extend((r"\l- enter:\l  + ", r"\l  + ".join(state["on_enter"])))
+        if "on_exit" in state:
+            parts.extend((r"\l- exit:\l  + ", r"\l  + ".join(state["on_exit"])))
+        if "timeout" in state:
+            parts.extend((r'\l- timeout(', state['timeout'], 's) -> (', ', '.join(state['on_timeout']), ')'))
         # end each label with a left-aligned newline
-        return label + r"\l"
+        parts.append(r"\l")
+        return "".join(parts)
 
     def _get_state_names(self, state):
         if isinstance(state, (list, tuple, set)):
             for res in state:
                 for inner in self._get_state_names(res):
                     yield inner
+        elif hasattr(state, "name"):
+            name = self._enum_names.get(state)
+            if name is None:
+                name = self.machine.state_cls.separator.join(self.machine._get_enum_path(state))
+                self._enum_names[state] = name
+            yield name
         else:
-            yield self.machine.state_cls.separator.join(self.machine._get_enum_path(state))\
-                if hasattr(state, "name") else state
+            yield state
 
     def _transition_label(self, tran):
         edge_label = tran.get("label", tran["trigger"])
         if "dest" not in tran:
             edge_label += " [internal]"
-        if self.machine.show_conditions and any(prop in tran for prop in ["conditions", "unless"]):
+        if self.machine.show_conditions and ("conditions" in tran or "unless" in tran):
             edge_label = "{edge_label} [{conditions}]".format(
                 edge_label=edge_label,
                 conditions=" & ".join(
-                    tran.get("conditions", []) + ["!" + u for u in tran.get("unless", [])]
+                    chain(tran.get("conditions", ()), ("!" + u for u in tran.get("unless", ())))
                 ),
             )
         return edge_label
@@ -106,12 +125,66 @@ class BaseGraph(object):
         else:
             return self.machine.get_global_name()
 
+    def _get_global_state_name(self, name):
+        """Resolves a state name in context of the machine's current scope and caches the result."""
+        key = (tuple(self.machine.prefix_path), name)
+        try:
+            return self._global_names[key]
+        except KeyError:
+            global_name = self._get_global_name(name.split(self.machine.state_cls.separator))
+            self._global_names[key] = global_name
+            return global_name
+
     def _flatten(self, *lists):
         return (e for a in lists for e in
                 (self._flatten(*a)
                  if isinstance(a, (tuple, list))
                  else (a.name if hasattr(a, 'name') else a,)))
 
+    def _get_roi_states(self, state_names):
+        """Returns a set of the passed state names and the names of all their parent states."""
+        roi_states = set()
+        sep = getattr(self.machine.state_cls, "separator", None)
+        for state in state_names:
+            if not sep:
+                roi_states.add(state)
+                continue
+            # walk up the parents; parents of an already added state have been added as well
+            while state and state not in roi_states:
+                roi_states.add(state)
+                state = state.rpartition(sep)[0]
+        return roi_states
+
+    def _is_complete_roi(self, roi_states):
+        """Returns True if the region of interest contains all states and thus equals the complete graph.
+        Args:
+            roi_states (set): Active states and their parents as returned by `_get_roi_states`.
+        """
+        if self._state_names is None:
+            get_nested_state_names = getattr(self.machine, "get_nested_state_names", None)
+            self._state_names = frozenset(
+                get_nested_state_names() if get_nested_state_names else self.machine.states
+            )
+        return self._state_names.issubset(roi_states)
+
+    def _update_elements(self):
+        """Collects states and transitions and stores them in `_elements`. Callbacks may be added after a graph has
+        been generated and graph attributes may be edited in place; graphs based on previously collected elements
+        or options must not be reused in these cases.
+        Returns:
+            bool: True if the elements or the options affecting the generated graph have changed since the last call.
+        """
+        elements = self._get_elements()
+        machine = self.machine
+        options = (machine.show_conditions, machine.show_state_attributes, machine.fast_layout,
+                   machine.machine_attributes, machine.style_attributes, machine.fast_layout_attributes)
+        if elements == self._elements and options == self._options:
+            return False
+        self._elements = elements
+        # attribute dictionaries are copied since they are usually edited in place
+        self._options = copy.deepcopy(options)
+        return True
+
     def _get_elements(self):
         states = []
         transitions = []
@@ -138,19 +211,18 @@ class BaseGraph(object):
                     if not prefix:
                         states.append(state)
 
+                    path = prefix + [state["name"]]
                     ini = state.get("initial", [])
                     if not isinstance(ini, list):
                         ini = ini.name if hasattr(ini, "name") else ini
                         tran = dict(
                             trigger="",
-                            source=self.machine.state_cls.separator.join(prefix + [state["name"]]),
-                            dest=self.machine.state_cls.separator.join(
-                                prefix + [state["name"], ini]
-                            ),
+                            source=self.machine.state_cls.separator.join(path),
+                            dest=self.machine.state_cls.separator.join(path + [ini]),
                         )
                         transitions.append(tran)
                     if state.get("children", []):
-                        queue.append((prefix + [state["name"]], state))
+                        queue.append((path, state))
         except KeyError:
             _LOGGER.error("Graph creation incomplete!")
         return states, transitions
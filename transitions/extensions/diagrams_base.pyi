@@ -1,5 +1,6 @@
 import abc
-from typing import BinaryIO, Protocol, Optional, Union, List, Dict, Tuple, Generator
+from enum import Enum
+from typing import Any, FrozenSet, Iterable, Set, BinaryIO, Protocol, Optional, Union, List, Dict, Tuple, Generator
 
 from .diagrams import GraphMachine, HierarchicalGraphMachine
 from ..core import ModelState
@@ -18,6 +19,11 @@ class GraphModelProtocol(Protocol):
 class BaseGraph(metaclass=abc.ABCMeta):
     machine: Union[GraphMachine, HierarchicalGraphMachine]
     fsm_graph: Optional[GraphProtocol]
+    _enum_names: Dict[Enum, str]
+    _global_names: Dict[Tuple[Tuple[str, ...], str], str]
+    _state_names: Optional[FrozenSet[str]]
+    _elements: Optional[Tuple[List[Dict[str, str]], List[Dict[str, str]]]]
+    _options: Optional[Tuple[bool, bool, bool, Dict[str, str], Dict[str, Any], Dict[str, str]]]
     def __init__(self, machine: GraphMachine) -> None: ...
     @abc.abstractmethod
     def generate(self) -> None: ...
@@ -33,5 +39,9 @@ class BaseGraph(metaclass=abc.ABCMeta):
     def _get_state_names(self, state: ModelState) -> Generator[str, None, None]: ...
     def _transition_label(self, tran: Dict[str, str]) -> str: ...
     def _get_global_name(self, path: List[str]) -> str: ...
+    def _get_global_state_name(self, name: str) -> str: ...
+    def _get_roi_states(self, state_names: Iterable[str]) -> Set[str]: ...
+    def _is_complete_roi(self, roi_states: Set[str]) -> bool: ...
+    def _update_elements(self) -> bool: ...
     def _get_elements(self) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]: ...
     def _flatten(self, *lists: Union[str, Tuple[str]]) -> List[str]: ...
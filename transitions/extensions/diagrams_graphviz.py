@@ -5,22 +5,41 @@
     Graphviz support for (nested) machines. This also includes partial views
     of currently valid transitions.
 """
-import copy
 import logging
 from functools import partial
 from collections import defaultdict
 from os.path import splitext
 
-try:
-    import graphviz as pgv
-except ImportError:
-    pgv = None
-
 from .diagrams_base import BaseGraph
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:  # pragma: no cover
+    # Python 2.7 without the 'futures' backport; diagrams are rendered one after another
+    ThreadPoolExecutor = None
+
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.addHandler(logging.NullHandler())
 
+# graphviz is imported when it is used for the first time; False if it could not be imported
+_pgv = None  # pylint: disable=invalid-name
+
+
+def _get_pgv():
+    """Imports graphviz on first use. Modules that only use helpers such as `filter_states`
+    (e.g. the mermaid backend) do not import graphviz this way.
+    Returns:
+        module or None: The graphviz module or None if graphviz is not installed.
+    """
+    global _pgv  # pylint: disable=global-statement,invalid-name
+    if _pgv is None:
+        try:
+            import graphviz  # pylint: disable=import-outside-toplevel
+            _pgv = graphviz
+        except ImportError:
+            _pgv = False
+    return _pgv or None
+
 
 class Graph(BaseGraph):
     """Graph creation for transitions.core.Machine.
@@ -30,6 +49,13 @@ class Graph(BaseGraph):
 
     def __init__(self, machine):
         self.custom_styles = {}
+        self._graph_cache = {}
+        self._pipe_cache = {}
+        # unstyled graphs per title and the positions of node and edge statements in their body
+        self._base_graphs = {}
+        # only set while a base graph is built
+        self._node_statements = None
+        self._edge_statements = None
         self.reset_styling()
         super(Graph, self).__init__(machine)
 
@@ -39,86 +65,180 @@ class Graph(BaseGraph):
 
     def set_node_style(self, state, style):
         self.custom_styles["node"][state.name if hasattr(state, "name") else state] = style
+        self._clear_cache()
 
     def reset_styling(self):
         self.custom_styles = {
             "edge": defaultdict(lambda: defaultdict(str)),
             "node": defaultdict(str),
         }
+        self._clear_cache()
+
+    def _clear_cache(self):
+        """Discards generated graphs and rendered output since the styling they were based on has changed."""
+        self._graph_cache.clear()
+        self._pipe_cache.clear()
 
     def _add_nodes(self, states, container):
+        # statements are added one by one via Digraph.node/edge; batching them into the body would require
+        # graphviz' private quoting helpers
+        node_styles = self.custom_styles["node"]
+        style_attributes = self.machine.style_attributes.get("node", {})
+        node_statements = self._node_statements
         for state in states:
-            style = self.custom_styles["node"][state["name"]]
+            name = state["name"]
+            label = self._convert_state_attributes(state)
+            if node_statements is not None:
+                node_statements[name] = (len(container.body), label)
             container.node(
-                state["name"],
-                label=self._convert_state_attributes(state),
-                **self.machine.style_attributes.get("node", {}).get(style, {})
+                name,
+                label=label,
+                **style_attributes.get(node_styles[name], {})
             )
 
     def _add_edges(self, transitions, container):
-        edge_labels = defaultdict(lambda: defaultdict(list))
-        for transition in transitions:
+        edge_labels = {}
+        for transition, label in zip(transitions, map(self._transition_label, transitions)):
             try:
                 dst = transition["dest"]
             except KeyError:
                 dst = transition["source"]
-            edge_labels[transition["source"]][dst].append(self._transition_label(transition))
-        for src, dests in edge_labels.items():
-            for dst, labels in dests.items():
-                style = self.custom_styles["edge"][src][dst]
-                container.edge(
-                    src,
-                    dst,
-                    label=" | ".join(labels),
-                    **self.machine.style_attributes.get("edge", {}).get(style, {})
-                )
+            key = (transition["source"], dst)
+            labels = edge_labels.get(key)
+            if labels is None:
+                edge_labels[key] = [label]
+            else:
+                labels.append(label)
+        edge_styles = self.custom_styles["edge"]
+        style_attributes = self.machine.style_attributes.get("edge", {})
+        edge_statements = self._edge_statements
+        for (src, dst), labels in edge_labels.items():
+            label = " | ".join(labels)
+            if edge_statements is not None:
+                edge_statements[(src, dst)] = (len(container.body), label)
+            container.edge(
+                src,
+                dst,
+                label=label,
+                **style_attributes.get(edge_styles.get(src, {}).get(dst, ""), {})
+            )
 
     def generate(self):
         """Triggers the generation of a graph. With graphviz backend, this does nothing since graph trees need to be
-        build from scratch with the configured styles.
+        built from scratch with the configured styles.
         """
-        if not pgv:  # pragma: no cover
+        if not _get_pgv():  # pragma: no cover
             raise Exception("AGraph diagram requires graphviz")
         # we cannot really generate a graph in advance with graphviz
 
     def get_graph(self, title=None, roi_state=None):
         title = title if title else self.machine.title
+        if self._update_elements():
+            # labels of generated graphs are outdated
+            self._graph_cache.clear()
+            self._base_graphs.clear()
+        # graphs are copied since callers may alter the returned graph
+        fsm_graph = self._get_cached_graph(title, roi_state).copy()
+        setattr(fsm_graph, "draw", partial(self.draw, fsm_graph))
+        return fsm_graph
+
+    def _get_cached_graph(self, title, roi_state):
+        """Returns the graph generated for `title` and `roi_state` with the current styling.
+        The returned graph is cached and must not be altered.
+        """
+        cache_key = (title, tuple(self._flatten(roi_state)) if roi_state else None)
+        try:
+            return self._graph_cache[cache_key]
+        except KeyError:
+            pass
+        if roi_state and self._is_complete_roi(self._get_roi_states(cache_key[1])):
+            # every state is part of the region of interest; reuse the complete graph
+            fsm_graph = self._get_cached_graph(title, None)
+        else:
+            fsm_graph = self._restyle_base_graph(title) if not roi_state else None
+            if fsm_graph is None:
+                fsm_graph = self._build_graph(title, roi_state)
+        self._graph_cache[cache_key] = fsm_graph
+        return fsm_graph
 
-        fsm_graph = pgv.Digraph(
+    def _create_graph(self, title):
+        fsm_graph = _get_pgv().Digraph(
             name=title,
             node_attr=self.machine.style_attributes.get("node", {}).get("default", {}),
             edge_attr=self.machine.style_attributes.get("edge", {}).get("default", {}),
             graph_attr=self.machine.style_attributes.get("graph", {}).get("default", {}),
         )
         fsm_graph.graph_attr.update(**self.machine.machine_attributes)
+        if self.machine.fast_layout:
+            fsm_graph.graph_attr.update(**self.machine.fast_layout_attributes)
         fsm_graph.graph_attr["label"] = title
+        return fsm_graph
+
+    def _build_graph(self, title, roi_state):
+        fsm_graph = self._create_graph(title)
         # For each state, draw a circle
-        states, transitions = self._get_elements()
+        states, transitions = self._elements
         if roi_state:
-            active_states = set()
-            sep = getattr(self.machine.state_cls, "separator", None)
-            for state in self._flatten(roi_state):
-                active_states.add(state)
-                if sep:
-                    state = sep.join(state.split(sep)[:-1])
-                    while state:
-                        active_states.add(state)
-                        state = sep.join(state.split(sep)[:-1])
-            transitions = [
-                t
-                for t in transitions
-                if t["source"] in active_states or self.custom_styles["edge"][t["source"]][t["dest"]]
-            ]
-            active_states = active_states.union({
-                t
-                for trans in transitions
-                for t in [trans["source"], trans.get("dest", trans["source"])]
-            })
-            active_states = active_states.union({k for k, style in self.custom_styles["node"].items() if style})
-            states = filter_states(copy.deepcopy(states), active_states, self.machine.state_cls)
+            active_states = self._get_roi_states(self._flatten(roi_state))
+            # keep transitions of active or styled edges and collect their states in a single pass
+            edge_styles = self.custom_styles["edge"]
+            roi_transitions = []
+            state_names = set(active_states)
+            for trans in transitions:
+                src = trans["source"]
+                dst = trans.get("dest", src)
+                if src in active_states or edge_styles.get(src, {}).get(dst):
+                    roi_transitions.append(trans)
+                    state_names.add(src)
+                    state_names.add(dst)
+            state_names.update(k for k, style in self.custom_styles["node"].items() if style)
+            transitions = roi_transitions
+            states = filter_states(states, state_names, self.machine.state_cls)
         self._add_nodes(states, fsm_graph)
         self._add_edges(transitions, fsm_graph)
-        setattr(fsm_graph, "draw", partial(self.draw, fsm_graph))
+        return fsm_graph
+
+    def _get_base_graph(self, title):
+        """Returns an unstyled graph and the positions and labels of its node and edge statements."""
+        try:
+            return self._base_graphs[title]
+        except KeyError:
+            pass
+        custom_styles = self.custom_styles
+        self.custom_styles = {"edge": {}, "node": defaultdict(str)}
+        self._node_statements, self._edge_statements = {}, {}
+        try:
+            base_graph = self._build_graph(title, None)
+            res = self._base_graphs[title] = (base_graph, self._node_statements, self._edge_statements)
+        finally:
+            self.custom_styles = custom_styles
+            self._node_statements = self._edge_statements = None
+        return res
+
+    def _restyle_base_graph(self, title):
+        """Copies the unstyled graph and only replaces the statements of styled nodes and edges.
+        Returns None when a styled node cannot be found in the base graph.
+        """
+        base_graph, node_statements, edge_statements = self._get_base_graph(title)
+        node_attributes = self.machine.style_attributes.get("node", {})
+        edge_attributes = self.machine.style_attributes.get("edge", {})
+        fsm_graph = base_graph.copy()
+        body = fsm_graph.body
+        for name, style in self.custom_styles["node"].items():
+            if style:
+                try:
+                    pos, label = node_statements[name]
+                except KeyError:
+                    return None
+                fsm_graph.node(name, label=label, **node_attributes.get(style, {}))
+                body[pos] = body.pop()
+        for src, dests in self.custom_styles["edge"].items():
+            for dst, style in dests.items():
+                # styled edges without transitions are not part of the graph
+                if style and (src, dst) in edge_statements:
+                    pos, label = edge_statements[(src, dst)]
+                    fsm_graph.edge(src, dst, label=label, **edge_attributes.get(style, {}))
+                    body[pos] = body.pop()
         return fsm_graph
 
     # pylint: disable=redefined-builtin,unused-argument
@@ -141,25 +261,77 @@ class Graph(BaseGraph):
                 raise ValueError(
                     "Parameter 'format' must not be None when filename is no valid file path."
                 )
-            return graph.pipe(format)
+            return self._pipe(graph, format)
         try:
             filename, ext = splitext(filename)
-            format = format if format is not None else ext[1:]
-            graph.render(filename, format=format if format else "png", cleanup=True)
         except (TypeError, AttributeError):
             if format is None:
                 raise ValueError(
                     "Parameter 'format' must not be None when filename is no valid file path."
                 )  # from None
-            filename.write(graph.pipe(format))
+            filename.write(self._pipe(graph, format))
+            return None
+        format = format if format is not None else ext[1:]
+        format = format if format else "png"
+        # pipe the source to graphviz instead of rendering a temporary dot file
+        with open(filename + "." + format, "wb") as fhandle:
+            fhandle.write(self._pipe(graph, format))
         return None
 
+    # pylint: disable=redefined-builtin
+    def draw_states(self, format="png", prog="dot", max_workers=None):
+        """Renders one diagram for each state of the machine in which this state is highlighted as active.
+        Graphs are generated one after another but rendered by concurrently running graphviz processes.
+        Concurrent rendering requires `concurrent.futures` (Python 3 or the `futures` backport for Python 2.7);
+        without it, diagrams are rendered one after another.
+        Args:
+            format (str): Format of the rendered diagrams
+            prog (str): Graphviz executable used for rendering
+            max_workers (int): Maximum number of graphviz processes running at the same time.
+                Defaults to the default of `concurrent.futures.ThreadPoolExecutor`.
+        Returns:
+            dict: Rendered diagrams (bytes) with state names as keys.
+        """
+        custom_styles = self.custom_styles
+        graphs = {}
+        try:
+            for state in self._get_machine_state_names():
+                self.reset_styling()
+                self.set_node_style(state, "active")
+                graphs[state] = self.get_graph()
+                graphs[state].engine = prog
+        finally:
+            self.custom_styles = custom_styles
+            self._clear_cache()
+        if ThreadPoolExecutor is None:  # pragma: no cover
+            return {state: graph.pipe(format) for state, graph in graphs.items()}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {state: executor.submit(graph.pipe, format) for state, graph in graphs.items()}
+        return {state: future.result() for state, future in futures.items()}
+
+    def _get_machine_state_names(self):
+        return list(self.machine.states)
+
+    def _pipe(self, graph, format):  # pylint: disable=redefined-builtin
+        """Renders a graph with graphviz and reuses the result as long as the dot source has not changed.
+        Only the most recent rendering is kept.
+        """
+        key = (graph.source, graph.engine, format)
+        try:
+            return self._pipe_cache[key]
+        except KeyError:
+            res = graph.pipe(format)
+            self._pipe_cache = {key: res}
+            return res
+
 
 class NestedGraph(Graph):
     """Graph creation support for transitions.extensions.nested.HierarchicalGraphMachine."""
 
     def __init__(self, *args, **kwargs):
-        self._cluster_states = []
+        # names of all (nested) states of a cluster state including the cluster state itself
+        self._cluster_descendants = {}
+        self._node_style_kwargs = {}
         super(NestedGraph, self).__init__(*args, **kwargs)
 
     def set_node_style(self, state, style):
@@ -167,27 +339,42 @@ class NestedGraph(Graph):
             super(NestedGraph, self).set_node_style(state_name, style)
 
     def set_previous_transition(self, src, dst):
-        src_name = self._get_global_name(src.split(self.machine.state_cls.separator))
-        dst_name = self._get_global_name(dst.split(self.machine.state_cls.separator))
+        src_name = self._get_global_state_name(src)
+        dst_name = self._get_global_state_name(dst)
         super(NestedGraph, self).set_previous_transition(src_name, dst_name)
 
+    def _get_machine_state_names(self):
+        return self.machine.get_nested_state_names()
+
+    def _restyle_base_graph(self, title):
+        # styles of nested states are merged and applied to clusters as well; build graphs from scratch instead
+        return None
+
     def _add_nodes(self, states, container):
+        # merged node styles are only reused while a graph is built to consider changed style attributes
+        self._node_style_kwargs = {}
+        self._cluster_descendants = {}
         self._add_nested_nodes(states, container, prefix="", default_style="default")
 
     def _add_nested_nodes(self, states, container, prefix, default_style):
+        """Adds states and their children to `container`.
+        Returns:
+            list(str): Names of all added states.
+        """
+        node_styles = self.custom_styles["node"]
+        graph_attributes = self.machine.style_attributes.get("graph", {})
+        node_attributes = self.machine.style_attributes.get("node", {})
+        separator = self.machine.state_cls.separator
+        names = []
         for state in states:
             name = prefix + state["name"]
+            names.append(name)
             label = self._convert_state_attributes(state)
             if state.get("children", None) is not None:
                 cluster_name = "cluster_" + name
                 attr = {"label": label, "rank": "source"}
-                attr.update(
-                    **self.machine.style_attributes.get("graph", {}).get(
-                        self.custom_styles["node"][name] or default_style, {}
-                    )
-                )
+                attr.update(**graph_attributes.get(node_styles[name] or default_style, {}))
                 with container.subgraph(name=cluster_name, graph_attr=attr) as sub:
-                    self._cluster_states.append(name)
                     is_parallel = isinstance(state.get("initial", ""), list)
                     with sub.subgraph(
                         name=cluster_name + "_root",
@@ -199,23 +386,26 @@ class NestedGraph(Graph):
                             fillcolor="black",
                             width="0.0" if is_parallel else "0.1",
                         )
-                    self._add_nested_nodes(
+                    children = self._add_nested_nodes(
                         state["children"],
                         sub,
                         default_style="parallel" if is_parallel else "default",
-                        prefix=prefix + state["name"] + self.machine.state_cls.separator,
+                        prefix=name + separator,
                     )
+                self._cluster_descendants[name] = frozenset(children).union((name,))
+                names.extend(children)
             else:
-                style = self.machine.style_attributes.get("node", {}).get(default_style, {}).copy()
-                style.update(
-                    self.machine.style_attributes.get("node", {}).get(
-                        self.custom_styles["node"][name] or default_style, {}
-                    )
-                )
+                style_key = (default_style, node_styles[name] or default_style)
+                style = self._node_style_kwargs.get(style_key)
+                if style is None:
+                    style = node_attributes.get(default_style, {}).copy()
+                    style.update(node_attributes.get(style_key[1], {}))
+                    self._node_style_kwargs[style_key] = style
                 container.node(name, label=label, **style)
+        return names
 
     def _add_edges(self, transitions, container):
-        edges_attr = defaultdict(lambda: defaultdict(dict))
+        edges_attr = {}
 
         for transition in transitions:
             # enable customizable labels
@@ -224,48 +414,48 @@ class NestedGraph(Graph):
                 dst = transition["dest"]
             except KeyError:
                 dst = src
-            if edges_attr[src][dst]:
-                attr = edges_attr[src][dst]
-                attr[attr["label_pos"]] = " | ".join(
-                    [edges_attr[src][dst][attr["label_pos"]], self._transition_label(transition)]
-                )
+            attr = edges_attr.get((src, dst))
+            if attr is None:
+                attr = edges_attr[(src, dst)] = self._create_edge_attr(src, dst, transition)
+                # collect labels of all transitions between src and dst and join them when the edge is added
+                attr[attr["label_pos"]] = [attr[attr["label_pos"]]]
             else:
-                edges_attr[src][dst] = self._create_edge_attr(src, dst, transition)
+                attr[attr["label_pos"]].append(self._transition_label(transition))
 
         for custom_src, dests in self.custom_styles["edge"].items():
             for custom_dst, style in dests.items():
-                if style and (
-                    custom_src not in edges_attr or custom_dst not in edges_attr[custom_src]
-                ):
-                    edges_attr[custom_src][custom_dst] = self._create_edge_attr(
+                if style and (custom_src, custom_dst) not in edges_attr:
+                    attr = edges_attr[(custom_src, custom_dst)] = self._create_edge_attr(
                         custom_src, custom_dst, {"trigger": "", "dest": ""}
                     )
+                    attr[attr["label_pos"]] = [attr[attr["label_pos"]]]
 
-        for src, dests in edges_attr.items():
-            for dst, attr in dests.items():
-                del attr["label_pos"]
-                style = self.custom_styles["edge"][src][dst]
-                attr.update(**self.machine.style_attributes.get("edge", {}).get(style, {}))
-                container.edge(attr.pop("source"), attr.pop("dest"), **attr)
+        edge_styles = self.custom_styles["edge"]
+        style_attributes = self.machine.style_attributes.get("edge", {})
+        for (src, dst), attr in edges_attr.items():
+            label_pos = attr.pop("label_pos")
+            attr[label_pos] = " | ".join(attr[label_pos])
+            style = edge_styles.get(src, {}).get(dst, "")
+            attr.update(**style_attributes.get(style, {}))
+            container.edge(attr.pop("source"), attr.pop("dest"), **attr)
 
     def _create_edge_attr(self, src, dst, transition):
         label_pos = "label"
         attr = {}
-        if src in self._cluster_states:
-            attr["ltail"] = "cluster_" + src
+        cluster_descendants = self._cluster_descendants
+        if src in cluster_descendants:
+            # omit ltail when dst is src or one of its children
+            if dst not in cluster_descendants[src]:
+                attr["ltail"] = "cluster_" + src
             label_pos = "headlabel"
         src_name = src
 
-        if dst in self._cluster_states:
-            if not src.startswith(dst):
+        if dst in cluster_descendants:
+            if src not in cluster_descendants[dst]:
                 attr["lhead"] = "cluster_" + dst
                 label_pos = "taillabel" if label_pos.startswith("l") else "label"
         dst_name = dst
 
-        # remove ltail when dst (ltail always starts with 'cluster_') is a child of src
-        if "ltail" in attr and dst_name.startswith(attr["ltail"][8:]):
-            del attr["ltail"]
-
         attr[label_pos] = self._transition_label(transition)
         attr["label_pos"] = label_pos
         attr["source"] = src_name
@@ -274,17 +464,20 @@ class NestedGraph(Graph):
 
 
 def filter_states(states, state_names, state_cls, prefix=None):
+    """Returns the states (and children) whose names are part of `state_names`. Passed state definitions
+    are not altered. Filtered states with children are returned as shallow copies instead.
+    """
     prefix = prefix or []
     result = []
     for state in states:
         pref = prefix + [state["name"]]
         included = getattr(state_cls, "separator", "_").join(pref) in state_names
         if "children" in state:
-            state["children"] = filter_states(
+            children = filter_states(
                 state["children"], state_names, state_cls, prefix=pref
             )
-            if state["children"] or included:
-                result.append(state)
+            if children or included:
+                result.append(dict(state, children=children))
         elif included:
             result.append(state)
     return result
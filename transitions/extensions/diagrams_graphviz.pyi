@@ -2,7 +2,8 @@ from ..core import State, ModelState
 from .diagrams import GraphMachine
 from .diagrams_base import BaseGraph
 from logging import Logger
-from typing import BinaryIO, Type, Optional, Dict, List, Union, DefaultDict, Any, Iterable
+from types import ModuleType
+from typing import Literal, BinaryIO, Type, Optional, Dict, List, Union, DefaultDict, Any, Iterable, Tuple, FrozenSet
 try:
     from graphviz import Digraph
     from graphviz.dot import SubgraphContext
@@ -14,13 +15,23 @@ except ImportError:
         pass
 
 _LOGGER: Logger
+_pgv: Union[None, Literal[False], ModuleType]
+
+def _get_pgv() -> Optional[ModuleType]: ...
 
 class Graph(BaseGraph):
     custom_styles: Dict[str, DefaultDict[str, Union[str, DefaultDict[str, str]]]]
+    _graph_cache: Dict[Tuple[str, Optional[Tuple[str, ...]]], Digraph]  # type: ignore[no-any-unimported]
+    _pipe_cache: Dict[Tuple[str, str, str], bytes]
+    _base_graphs: Dict[str, Tuple[Digraph, Dict[str, Tuple[int, str]],  # type: ignore[no-any-unimported]
+                                  Dict[Tuple[str, str], Tuple[int, str]]]]
+    _node_statements: Optional[Dict[str, Tuple[int, str]]]
+    _edge_statements: Optional[Dict[Tuple[str, str], Tuple[int, str]]]
     def __init__(self, machine: Type[GraphMachine]) -> None: ...
     def set_previous_transition(self, src: str, dst: str) -> None: ...
     def set_node_style(self, state: ModelState, style: str) -> None: ...
     def reset_styling(self) -> None: ...
+    def _clear_cache(self) -> None: ...
     def _add_nodes(self, states: List[Dict[str, str]],   # type: ignore[no-any-unimported]
                    container: Union[Digraph, SubgraphContext]) -> None: ...
     def _add_edges(self, transitions: List[Dict[str, str]],  # type: ignore[no-any-unimported]
@@ -28,19 +39,34 @@ class Graph(BaseGraph):
     def generate(self) -> None: ...
     def get_graph(self, title: Optional[str] = ...,  # type: ignore[no-any-unimported]
                   roi_state: Optional[str] = ...) -> Digraph: ...
+    def _get_cached_graph(self, title: str,  # type: ignore[no-any-unimported]
+                          roi_state: Optional[Union[str, List[str]]]) -> Digraph: ...
+    def _create_graph(self, title: str) -> Digraph: ...  # type: ignore[no-any-unimported]
+    def _build_graph(self, title: str,  # type: ignore[no-any-unimported]
+                     roi_state: Optional[Union[str, List[str]]]) -> Digraph: ...
+    def _get_base_graph(self, title: str) -> Tuple[Digraph, Dict[str, Tuple[int, str]],  # type: ignore[no-any-unimported]
+                                                   Dict[Tuple[str, str], Tuple[int, str]]]: ...
+    def _restyle_base_graph(self, title: str) -> Optional[Digraph]: ...  # type: ignore[no-any-unimported]
     def draw(self, filename: Optional[Union[str, BinaryIO]], format:Optional[str] = ...,
              prog: Optional[str] = ..., args:str = ...) -> Optional[str]: ...
+    def draw_states(self, format: str = ..., prog: str = ...,
+                    max_workers: Optional[int] = ...) -> Dict[str, bytes]: ...
+    def _get_machine_state_names(self) -> List[str]: ...
+    def _pipe(self, graph: Digraph, format: str) -> bytes: ...  # type: ignore[no-any-unimported]
 
 class NestedGraph(Graph):
-    _cluster_states: List[str]
+    _cluster_descendants: Dict[str, FrozenSet[str]]
+    _node_style_kwargs: Dict[Tuple[str, str], Dict[str, str]]
     def __init__(self, *args: Any, **kwargs: Any) -> None: ...
     def set_previous_transition(self, src: str, dst: str) -> None: ...
+    def _get_machine_state_names(self) -> List[str]: ...
+    def _restyle_base_graph(self, title: str) -> None: ...
     def _add_nodes(self, states: List[Dict[str, str]],  # type: ignore[no-any-unimported]
                    container: Union[Digraph, SubgraphContext]) -> None: ...
     def _add_nested_nodes(self,  # type: ignore[no-any-unimported]
                           states: List[Dict[str, Union[str, List[Dict[str, str]]]]],
                           container: Union[Digraph, SubgraphContext],
-                          prefix: str, default_style: str) -> None: ...
+                          prefix: str, default_style: str) -> List[str]: ...
     def _add_edges(self, transitions: List[Dict[str, str]],  # type: ignore[no-any-unimported]
                    container: Union[Digraph, SubgraphContext]) -> None: ...
     def _create_edge_attr(self, src: str, dst: str, transition: Dict[str, str]) -> Dict[str, Any]: ...
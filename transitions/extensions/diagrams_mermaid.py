@@ -5,8 +5,8 @@
     Mermaid support for (nested) machines. This also includes partial views
     of currently valid transitions.
 """
-import copy
 import logging
+import os
 from collections import defaultdict
 
 from .diagrams_graphviz import filter_states
@@ -24,6 +24,7 @@ class Graph(BaseGraph):
 
     def __init__(self, machine):
         self.custom_styles = {}
+        self._graph_cache = {}
         self.reset_styling()
         super(Graph, self).__init__(machine)
 
@@ -33,27 +34,33 @@ class Graph(BaseGraph):
 
     def set_node_style(self, state, style):
         self.custom_styles["node"][state.name if hasattr(state, "name") else state] = style
+        self._graph_cache.clear()
 
     def reset_styling(self):
         self.custom_styles = {
             "edge": defaultdict(lambda: defaultdict(str)),
             "node": defaultdict(str),
         }
+        self._graph_cache.clear()
 
     def _add_nodes(self, states, container):
         for state in states:
-            container.append("state \"{}\" as {}".format(self._convert_state_attributes(state), state["name"]))
-            container.append("Class {} s_{}".format(state["name"],
-                                                    self.custom_styles["node"][state["name"]] or "default"))
+            name = state["name"]
+            container.append("state \"{}\" as {}".format(self._convert_state_attributes(state), name))
+            container.append("Class {} s_{}".format(name, self.custom_styles["node"].get(name) or "default"))
 
     def _add_edges(self, transitions, container):
-        edge_labels = defaultdict(lambda: defaultdict(list))
-        for transition in transitions:
+        edge_labels = {}
+        for transition, label in zip(transitions, map(self._transition_label, transitions)):
+            src = transition["source"]
             try:
                 dst = transition["dest"]
             except KeyError:
-                dst = transition["source"]
-            edge_labels[transition["source"]][dst].append(self._transition_label(transition))
+                dst = src
+            try:
+                edge_labels[src][dst].append(label)
+            except KeyError:
+                edge_labels.setdefault(src, {})[dst] = [label]
         for src, dests in edge_labels.items():
             for dst, labels in dests.items():
                 container.append("{} --> {}: {}".format(src, dst, " | ".join(labels)))
@@ -66,6 +73,16 @@ class Graph(BaseGraph):
 
     def get_graph(self, title=None, roi_state=None):
         title = title if title else self.machine.title
+        if self._update_elements():
+            # labels of cached diagrams are outdated
+            self._graph_cache.clear()
+        roi_key = tuple(self._flatten(roi_state)) if roi_state else None
+        cache_key = (title, roi_key)
+        try:
+            # every call returns a new diagram since callers may replace its source
+            return DigraphMock(lines=self._graph_cache[cache_key])
+        except KeyError:
+            pass
 
         fsm_graph = ['---', title, '---', 'stateDiagram-v2']
         fsm_graph.extend(_to_mermaid(self.machine.machine_attributes, " "))
@@ -75,61 +92,48 @@ class Graph(BaseGraph):
                 fsm_graph.append("classDef s_{} {}".format(
                     style_name, ','.join(_to_mermaid(style_attrs, ":"))))
         fsm_graph.append("")
-        states, transitions = self._get_elements()
-        if roi_state:
-            active_states = set()
-            sep = getattr(self.machine.state_cls, "separator", None)
-            for state in self._flatten(roi_state):
-                active_states.add(state)
-                if sep:
-                    state = sep.join(state.split(sep)[:-1])
-                    while state:
-                        active_states.add(state)
-                        state = sep.join(state.split(sep)[:-1])
-            transitions = [
-                t
-                for t in transitions
-                if t["source"] in active_states or self.custom_styles["edge"][t["source"]][t["dest"]]
-            ]
-            active_states = active_states.union({
-                t
-                for trans in transitions
-                for t in [trans["source"], trans.get("dest", trans["source"])]
-            })
-            active_states = active_states.union({k for k, style in self.custom_styles["node"].items() if style})
-            states = filter_states(copy.deepcopy(states), active_states, self.machine.state_cls)
+        states, transitions = self._elements
+        # nothing has to be filtered when the region of interest contains all states
+        active_states = self._get_roi_states(roi_key) if roi_state else None
+        if active_states is not None and not self._is_complete_roi(active_states):
+            # keep transitions of active or styled edges and collect their states in a single pass;
+            # reading edge styles must not add entries to custom_styles
+            edge_styles = self.custom_styles["edge"]
+            roi_transitions = []
+            state_names = set(active_states)
+            for trans in transitions:
+                src = trans["source"]
+                dst = trans.get("dest", src)
+                if src in active_states or edge_styles.get(src, {}).get(dst):
+                    roi_transitions.append(trans)
+                    state_names.add(src)
+                    state_names.add(dst)
+            state_names.update(k for k, style in self.custom_styles["node"].items() if style)
+            transitions = roi_transitions
+            states = filter_states(states, state_names, self.machine.state_cls)
         self._add_nodes(states, fsm_graph)
         fsm_graph.append("")
         self._add_edges(transitions, fsm_graph)
         if self.machine.initial and (roi_state is None or roi_state == self.machine.initial):
             fsm_graph.append("[*] --> {}".format(self.machine.initial))
 
-        indent = 0
-        for i in range(len(fsm_graph)):
-            next_indent = indent
-            if fsm_graph[i].startswith("stateDiagram") or fsm_graph[i].endswith("{"):
-                next_indent += 2
-            elif fsm_graph[i].startswith("}"):
-                indent -= 2
-                next_indent -= 2
-            fsm_graph[i] = " " * indent + fsm_graph[i]
-            indent = next_indent
-
-        return DigraphMock("\n".join(fsm_graph))
+        self._graph_cache[cache_key] = fsm_graph
+        return DigraphMock(lines=fsm_graph)
 
     def _convert_state_attributes(self, state):
         label = state.get("label", state["name"])
-        if self.machine.show_state_attributes:
-            if "tags" in state:
-                label += " [" + ", ".join(state["tags"]) + "]"
-            if "on_enter" in state:
-                label += r"\n- enter:\n  + " + r"\n  + ".join(state["on_enter"])
-            if "on_exit" in state:
-                label += r"\n- exit:\n  + " + r"\n  + ".join(state["on_exit"])
-            if "timeout" in state:
-                label += r'\n- timeout(' + state['timeout'] + 's) -> (' + ', '.join(state['on_timeout']) + ')'
-        # end each label with a left-aligned newline
-        return label
+        if not self.machine.show_state_attributes:
+            return label
+        parts = [label]
+        if "tags" in state:
+            parts.extend((" [", ", ".join(state["tags"]), "]"))
+        if "on_enter" in state:
+            parts.extend((r"\n- enter:\n  + ", r"\n  + ".join(state["on_enter"])))
+        if "on_exit" in state:
+            parts.extend((r"\n- exit:\n  + ", r"\n  + ".join(state["on_exit"])))
+        if "timeout" in state:
+            parts.extend((r'\n- timeout(', state['timeout'], 's) -> (', ', '.join(state['on_timeout']), ')'))
+        return "".join(parts)
 
 
 class NestedGraph(Graph):
@@ -148,9 +152,12 @@ class NestedGraph(Graph):
         self.set_node_style(src, "previous")
 
     def _add_nodes(self, states, container):
+        self._cluster_states = []
         self._add_nested_nodes(states, container, prefix="", default_style="default")
 
     def _add_nested_nodes(self, states, container, prefix, default_style):
+        node_styles = self.custom_styles["node"]
+        separator = self.machine.state_cls.separator
         for state in states:
             name = prefix + state["name"]
             container.append("state \"{}\" as {}".format(self._convert_state_attributes(state), name))
@@ -158,65 +165,64 @@ class NestedGraph(Graph):
                 container.append("{} --> [*]".format(name))
             if not prefix:
                 container.append("Class {} s_{}".format(name.replace(" ", ""),
-                                                        self.custom_styles["node"][name] or default_style))
+                                                        node_styles.get(name) or default_style))
             if state.get("children", None) is not None:
                 container.append("state {} {{".format(name))
                 self._cluster_states.append(name)
                 # with container.subgraph(name=cluster_name, graph_attr=attr) as sub:
                 initial = state.get("initial", "")
                 is_parallel = isinstance(initial, list)
+                child_prefix = name + separator
                 if is_parallel:
-                    for child in state["children"]:
+                    for idx, child in enumerate(state["children"]):
+                        # separate parallel regions
+                        if idx:
+                            container.append("--")
                         self._add_nested_nodes(
                             [child],
                             container,
                             default_style="parallel",
-                            prefix=prefix + state["name"] + self.machine.state_cls.separator,
+                            prefix=child_prefix,
                         )
-                        container.append("--")
-                    if state["children"]:
-                        container.pop()
                 else:
                     if initial:
-                        container.append("[*] --> {}".format(
-                            prefix + state["name"] + self.machine.state_cls.separator + initial))
+                        container.append("[*] --> {}".format(child_prefix + initial))
                     self._add_nested_nodes(
                         state["children"],
                         container,
                         default_style="default",
-                        prefix=prefix + state["name"] + self.machine.state_cls.separator,
+                        prefix=child_prefix,
                     )
                 container.append("}")
 
     def _add_edges(self, transitions, container):
-        edges_attr = defaultdict(lambda: defaultdict(dict))
+        edges_attr = {}
 
         for transition in transitions:
             # enable customizable labels
             src = transition["source"]
             dst = transition.get("dest", src)
-            if edges_attr[src][dst]:
-                attr = edges_attr[src][dst]
-                attr["label"] = " | ".join(
-                    [edges_attr[src][dst]["label"], self._transition_label(transition)]
-                )
-            else:
-                edges_attr[src][dst] = self._create_edge_attr(src, dst, transition)
+            dests = edges_attr.setdefault(src, {})
+            try:
+                dests[dst]["label"].append(self._transition_label(transition))
+            except KeyError:
+                attr = dests[dst] = self._create_edge_attr(src, dst, transition)
+                # labels are joined once when the edge is added
+                attr["label"] = [attr["label"]]
 
         for custom_src, dests in self.custom_styles["edge"].items():
             for custom_dst, style in dests.items():
-                if style and (
-                    custom_src not in edges_attr or custom_dst not in edges_attr[custom_src]
-                ):
-                    edges_attr[custom_src][custom_dst] = self._create_edge_attr(
+                if style and custom_dst not in edges_attr.get(custom_src, {}):
+                    attr = edges_attr.setdefault(custom_src, {})[custom_dst] = self._create_edge_attr(
                         custom_src, custom_dst, {"trigger": "", "dest": ""}
                     )
+                    attr["label"] = [attr["label"]]
 
-        for src, dests in edges_attr.items():
-            for dst, attr in dests.items():
-                if not attr["label"]:
-                    continue
-                container.append("{source} --> {dest}: {label}".format(**attr))
+        for dests in edges_attr.values():
+            for attr in dests.values():
+                label = " | ".join(attr["label"])
+                if label:
+                    container.append("%s --> %s: %s" % (attr["source"], attr["dest"], label))
 
     def _create_edge_attr(self, src, dst, transition):
         return {"source": src, "dest": dst, "label": self._transition_label(transition)}
@@ -224,8 +230,26 @@ class NestedGraph(Graph):
 
 class DigraphMock:
 
-    def __init__(self, source):
-        self.source = source
+    def __init__(self, source=None, lines=None):
+        # unindented lines are only joined when the source is accessed for the first time
+        self._source = source
+        self._lines = lines
+        # encoded source; reused when the diagram is drawn more than once
+        self._encoded = None
+
+    @property
+    def source(self):
+        """str: The mermaid diagram definition."""
+        if self._source is None:
+            self._source = "\n".join(_indent(self._lines))
+            self._lines = None
+        return self._source
+
+    @source.setter
+    def source(self, value):
+        self._source = value
+        self._lines = None
+        self._encoded = None
 
     # pylint: disable=redefined-builtin,unused-argument
     def draw(self, filename, format=None, prog="dot", args=""):
@@ -247,11 +271,32 @@ class DigraphMock:
         if isinstance(filename, str):
             with open(filename, "w") as f:
                 f.write(self.source)
+            return None
+        if self._encoded is None:
+            self._encoded = self.source.encode()
+        if isinstance(filename, int):
+            # write to file descriptors directly; os.write may not write all bytes at once
+            view = memoryview(self._encoded)
+            while view:
+                view = view[os.write(filename, view):]
         else:
-            filename.write(self.source.encode())
+            filename.write(self._encoded)
         return None
 
 
+def _indent(lines):
+    """Yields lines indented by two spaces per opened diagram or state block."""
+    indent = ""
+    for line in lines:
+        if line.startswith("stateDiagram") or line.endswith("{"):
+            yield indent + line
+            indent += "  "
+        else:
+            if line.startswith("}"):
+                indent = indent[:-2]
+            yield indent + line
+
+
 invalid = {"style", "shape", "peripheries", "strict", "directed"}
 convertible = {"fillcolor": "fill", "rankdir": "direction"}
 
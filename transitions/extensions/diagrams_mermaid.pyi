@@ -2,12 +2,13 @@ from ..core import ModelState
 from .diagrams import GraphMachine
 from .diagrams_base import BaseGraph, GraphProtocol
 from logging import Logger
-from typing import Type, Optional, Dict, List, Union, DefaultDict, Any, BinaryIO, Set
+from typing import Iterable, Generator, Tuple, Type, Optional, Dict, List, Union, DefaultDict, Any, BinaryIO, Set
 
 _LOGGER: Logger
 
 class Graph(BaseGraph):
     custom_styles: Dict[str, DefaultDict[str, Union[str, DefaultDict[str, str]]]]
+    _graph_cache: Dict[Tuple[str, Optional[Tuple[str, ...]]], List[str]]
     def __init__(self, machine: Type[GraphMachine]) -> None: ...
     def set_previous_transition(self, src: str, dst: str) -> None: ...
     def set_node_style(self, state: ModelState, style: str) -> None: ...
@@ -37,13 +38,21 @@ class NestedGraph(Graph):
 
 class DigraphMock(GraphProtocol):
 
-    source: str
+    _source: Optional[str]
+    _lines: Optional[List[str]]
+    _encoded: Optional[bytes]
 
-    def __init__(self, source: str) -> None: ...
+    def __init__(self, source: Optional[str] = ..., lines: Optional[List[str]] = ...) -> None: ...
+    @property
+    def source(self) -> str: ...
+    @source.setter
+    def source(self, value: str) -> None: ...
 
     def draw(self, filename: Optional[Union[str, BinaryIO]], format:Optional[str] = ...,
              prog: Optional[str] = ..., args:str = ...) -> Optional[str]: ...
 
+def _indent(lines: Iterable[str]) -> Generator[str, None, None]: ...
+
 invalid = Set[str]
 convertible = Dict[str, str]
 
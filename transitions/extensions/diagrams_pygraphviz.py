@@ -8,92 +8,116 @@
 
 import logging
 
-try:
-    import pygraphviz as pgv
-except ImportError:
-    pgv = None
-
-from .nesting import NestedState
 from .diagrams_base import BaseGraph
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.addHandler(logging.NullHandler())
 
+# pygraphviz is imported when it is used for the first time; False if it could not be imported
+_pgv = None  # pylint: disable=invalid-name
+
+
+def _get_pgv():
+    """Imports pygraphviz on first use which spares loading its C extension when no diagram is created.
+    Returns:
+        module or None: The pygraphviz module or None if pygraphviz is not installed.
+    """
+    global _pgv  # pylint: disable=global-statement,invalid-name
+    if _pgv is None:
+        try:
+            import pygraphviz  # pylint: disable=import-outside-toplevel
+            _pgv = pygraphviz
+        except ImportError:
+            _pgv = False
+    return _pgv or None
+
 
 class Graph(BaseGraph):
     """Graph creation for transitions.core.Machine."""
 
     def _add_nodes(self, states, container):
+        shape = self._node_styles.get('default', {}).get('shape', None)
         for state in states:
-            shape = self.machine.style_attributes.get('node', {}).get('default', {}).get('shape', None)
             container.add_node(state['name'], label=self._convert_state_attributes(state), shape=shape)
 
     def _add_edges(self, transitions, container):
-        for transition in transitions:
+        # edges are added once with the labels of all their transitions instead of being looked up per transition
+        edge_labels = {}
+        for transition, label in zip(transitions, map(self._transition_label, transitions)):
             src = transition['source']
-            edge_attr = {'label': self._transition_label(transition)}
             try:
                 dst = transition['dest']
             except KeyError:
                 dst = src
-            if container.has_edge(src, dst):
-                edge = container.get_edge(src, dst)
-                edge.attr['label'] = edge.attr['label'] + ' | ' + edge_attr['label']
-            else:
-                container.add_edge(src, dst, **edge_attr)
+            try:
+                edge_labels[(src, dst)].append(label)
+            except KeyError:
+                edge_labels[(src, dst)] = [label]
+        add_edge = container.add_edge
+        for (src, dst), labels in edge_labels.items():
+            add_edge(src, dst, label=' | '.join(labels))
 
     def generate(self):
-
-        self.fsm_graph = pgv.AGraph(**self.machine.machine_attributes)
-        self.fsm_graph.node_attr.update(self.machine.style_attributes.get('node', {}).get('default', {}))
-        self.fsm_graph.edge_attr.update(self.machine.style_attributes.get('edge', {}).get('default', {}))
+        # style dictionaries per element type; looked up once instead of on every styling call
+        style_attributes = self.machine.style_attributes
+        self._node_styles = style_attributes.get('node', {})
+        self._edge_styles = style_attributes.get('edge', {})
+        self._graph_styles = style_attributes.get('graph', {})
+        self.fsm_graph = _get_pgv().AGraph(**self.machine.machine_attributes)
+        if self.machine.fast_layout:
+            self.fsm_graph.graph_attr.update(self.machine.fast_layout_attributes)
+        self.fsm_graph.node_attr.update(self._node_styles.get('default', {}))
+        self.fsm_graph.edge_attr.update(self._edge_styles.get('default', {}))
         states, transitions = self._get_elements()
         self._add_nodes(states, self.fsm_graph)
         self._add_edges(transitions, self.fsm_graph)
-        setattr(self.fsm_graph, 'style_attributes', self.machine.style_attributes)
+        setattr(self.fsm_graph, 'style_attributes', style_attributes)
 
     def get_graph(self, title=None, roi_state=None):
-        if title:
+        if title and self.fsm_graph.graph_attr.get('label') != title:
             self.fsm_graph.graph_attr['label'] = title
         if roi_state:
-            filtered = _copy_agraph(self.fsm_graph)
-            kept_nodes = set()
-            kept_edges = set()
-            sep = getattr(self.machine.state_cls, "separator", None)
-            for state in self._flatten(roi_state):
-                kept_nodes.add(state)
-                if sep:
-                    state = sep.join(state.split(sep)[:-1])
-                    while state:
-                        kept_nodes.add(state)
-                        state = sep.join(state.split(sep)[:-1])
-
-            # remove all edges that have no connection to the currently active state
-            for state in list(kept_nodes):
-                for edge in filtered.out_edges_iter(state):
-                    kept_nodes.add(edge[1])
-                    kept_edges.add(edge)
-
-                for edge in filtered.in_edges(state):
-                    if edge.attr['color'] == self.fsm_graph.style_attributes.get('edge', {}).get('previous', {}).get('color', None):
-                        kept_nodes.add(edge[0])
-                        kept_edges.add(edge)
-
-            for node in filtered.nodes():
-                if node not in kept_nodes:
-                    filtered.delete_node(node)
-
-            for edge in filtered.edges():
-                if edge not in kept_edges:
-                    filtered.delete_edge(edge)
-
-            return filtered
+            # filtered graphs are not cached since fsm_graph is returned to and may be altered by users
+            kept_nodes = self._get_roi_states(tuple(self._flatten(roi_state)))
+            if self._is_complete_roi(kept_nodes):
+                # every state is part of the region of interest; there is nothing to filter
+                return _copy_agraph(self.fsm_graph)
+            # states are sorted to keep the filtered graph independent of the iteration order of sets
+            roi_nodes = sorted(kept_nodes)
+            roi_set = frozenset(roi_nodes)
+            kept_edges = []
+            previous_color = self._edge_styles.get('previous', {}).get('color', None)
+
+            # only edges adjacent to the region of interest are visited: all outgoing edges and
+            # incoming edges of the previous transition which do not start in the region of interest
+            for edge in self.fsm_graph.out_edges_iter(roi_nodes):
+                kept_nodes.add(edge[1])
+                kept_edges.append(edge)
+            for edge in self.fsm_graph.in_edges_iter(roi_nodes):
+                if edge[0] not in roi_set and edge.attr['color'] == previous_color:
+                    kept_nodes.add(edge[0])
+                    kept_edges.append(edge)
+
+            return self._filter_graph(kept_nodes, kept_edges)
         return self.fsm_graph
 
+    def _filter_graph(self, kept_nodes, kept_edges):
+        """Builds a new graph which only contains the passed nodes and edges of fsm_graph."""
+        filtered = _get_pgv().AGraph(**self.machine.machine_attributes)
+        filtered.graph_attr.update(self.fsm_graph.graph_attr)
+        filtered.node_attr.update(self.fsm_graph.node_attr)
+        filtered.edge_attr.update(self.fsm_graph.edge_attr)
+        for node in self.fsm_graph.nodes_iter():
+            if node in kept_nodes:
+                filtered.add_node(node, **node.attr)
+        for edge in kept_edges:
+            if not filtered.has_edge(edge[0], edge[1]):
+                filtered.add_edge(edge[0], edge[1], **edge.attr)
+        return filtered
+
     def set_node_style(self, state, style):
         node = self.fsm_graph.get_node(state.name if hasattr(state, "name") else state)
-        style_attr = self.fsm_graph.style_attributes.get('node', {}).get(style, {})
-        node.attr.update(style_attr)
+        node.attr.update(self._node_styles.get(style, {}))
 
     def set_previous_transition(self, src, dst):
         try:
@@ -101,21 +125,20 @@ class Graph(BaseGraph):
         except KeyError:
             self.fsm_graph.add_edge(src, dst)
             edge = self.fsm_graph.get_edge(src, dst)
-        style_attr = self.fsm_graph.style_attributes.get('edge', {}).get('previous', {})
-        edge.attr.update(style_attr)
+        edge.attr.update(self._edge_styles.get('previous', {}))
         self.set_node_style(src, 'previous')
         self.set_node_style(dst, 'active')
 
     def reset_styling(self):
+        style_attr = self._edge_styles.get('default', {})
         for edge in self.fsm_graph.edges_iter():
-            style_attr = self.fsm_graph.style_attributes.get('edge', {}).get('default', {})
             edge.attr.update(style_attr)
+        style_attr = self._node_styles.get('inactive', {})
         for node in self.fsm_graph.nodes_iter():
             if 'point' not in node.attr['shape']:
-                style_attr = self.fsm_graph.style_attributes.get('node', {}).get('inactive', {})
                 node.attr.update(style_attr)
+        style_attr = self._graph_styles.get('default', {})
         for sub_graph in self.fsm_graph.subgraphs_iter():
-            style_attr = self.fsm_graph.style_attributes.get('graph', {}).get('default', {})
             sub_graph.graph_attr.update(style_attr)
 
 
@@ -123,10 +146,19 @@ class NestedGraph(Graph):
     """Graph creation support for transitions.extensions.nested.HierarchicalGraphMachine."""
 
     def __init__(self, *args, **kwargs):
-        self.seen_transitions = []
+        self.seen_transitions = set()
+        # subgraphs of fsm_graph by name; collected while nodes are added
+        self._subgraphs = {}
         super(NestedGraph, self).__init__(*args, **kwargs)
 
+    def generate(self):
+        self._subgraphs = {}
+        super(NestedGraph, self).generate()
+
     def _add_nodes(self, states, container, prefix='', default_style='default'):
+        graph_attr = self._graph_styles.get(default_style, {})
+        node_attr = self._node_styles.get(default_style, {})
+        separator = self.machine.state_cls.separator
         for state in states:
             name = prefix + state['name']
             label = self._convert_state_attributes(state)
@@ -134,51 +166,68 @@ class NestedGraph(Graph):
             if 'children' in state:
                 cluster_name = "cluster_" + name
                 is_parallel = isinstance(state.get('initial', ''), list)
-                sub = container.add_subgraph(name=cluster_name, label=label, rank='source',
-                                             **self.machine.style_attributes.get('graph', {}).get(default_style, {}))
+                sub = container.add_subgraph(name=cluster_name, label=label, rank='source', **graph_attr)
                 root_container = sub.add_subgraph(name=cluster_name + '_root', label='', color=None, rank='min')
+                self._subgraphs[cluster_name] = sub
+                self._subgraphs[cluster_name + '_root'] = root_container
                 width = '0' if is_parallel else '0.1'
                 root_container.add_node(name, shape='point', fillcolor='black', width=width)
-                self._add_nodes(state['children'], sub, prefix=prefix + state['name'] + NestedState.separator,
+                self._add_nodes(state['children'], sub, prefix=name + separator,
                                 default_style='parallel' if is_parallel else 'default')
             else:
-                container.add_node(name, label=label, **self.machine.style_attributes.get('node', {}).get(default_style, {}))
+                container.add_node(name, label=label, **node_attr)
 
     def _add_edges(self, transitions, container):
-
+        # labels of all transitions between two states are collected first and joined when the edge is added
+        edges_attr = {}
+        separator = self.machine.state_cls.separator
         for transition in transitions:
-            # enable customizable labels
-            label_pos = 'label'
             src = transition['source']
             try:
                 dst = transition['dest']
             except KeyError:
                 dst = src
+            try:
+                edge_attr, label_pos = edges_attr[(src, dst)]
+            except KeyError:
+                pass
+            else:
+                edge_attr[label_pos].append(self._transition_label(transition))
+                continue
+            # enable customizable labels
+            label_pos = 'label'
             edge_attr = {}
-            if _get_subgraph(container, 'cluster_' + src) is not None:
+            if 'cluster_' + src in self._subgraphs:
                 edge_attr['ltail'] = 'cluster_' + src
                 # edge_attr['minlen'] = "3"
                 label_pos = 'headlabel'
-            src_name = src
 
-            dst_graph = _get_subgraph(container, 'cluster_' + dst)
-            if dst_graph is not None:
-                if not src.startswith(dst):
+            if 'cluster_' + dst in self._subgraphs:
+                # omit lhead when src is dst or one of its children
+                if not (src == dst or src.startswith(dst + separator)):
                     edge_attr['lhead'] = "cluster_" + dst
                     label_pos = 'taillabel' if label_pos.startswith('l') else 'label'
-            dst_name = dst
 
-            # remove ltail when dst is a child of src
+            # remove ltail when dst is a child of src; the cluster of src contains exactly src and its descendants
             if 'ltail' in edge_attr:
-                if _get_subgraph(container, edge_attr['ltail']).has_node(dst_name):
+                if dst == src or dst.startswith(src + separator):
                     del edge_attr['ltail']
 
-            edge_attr[label_pos] = self._transition_label(transition)
-            if container.has_edge(src_name, dst_name):
-                edge = container.get_edge(src_name, dst_name)
-                edge.attr[label_pos] += ' | ' + edge_attr[label_pos]
-            else:
-                container.add_edge(src_name, dst_name, **edge_attr)
+            edge_attr[label_pos] = [self._transition_label(transition)]
+            edges_attr[(src, dst)] = (edge_attr, label_pos)
+
+        for (src, dst), (edge_attr, label_pos) in edges_attr.items():
+            edge_attr[label_pos] = ' | '.join(edge_attr[label_pos])
+            container.add_edge(src, dst, **edge_attr)
+
+    def _filter_graph(self, kept_nodes, kept_edges):
+        # clusters cannot be rebuilt from nodes and edges alone; remove everything else from a copy instead
+        filtered = _copy_agraph(self.fsm_graph)
+        kept_edges = set(kept_edges)
+        # only the elements to be removed are collected since the graph must not change while it is iterated
+        filtered.delete_nodes_from([node for node in filtered.nodes_iter() if node not in kept_nodes])
+        filtered.delete_edges_from([edge for edge in filtered.edges_iter() if edge not in kept_edges])
+        return filtered
 
     def set_node_style(self, state, style):
         for state_name in self._get_state_names(state):
@@ -187,25 +236,23 @@ class NestedGraph(Graph):
     def _set_node_style(self, state, style):
         try:
             node = self.fsm_graph.get_node(state)
-            style_attr = self.fsm_graph.style_attributes.get('node', {}).get(style, {})
-            node.attr.update(style_attr)
+            node.attr.update(self._node_styles.get(style, {}))
         except KeyError:
-            subgraph = _get_subgraph(self.fsm_graph, state)
-            style_attr = self.fsm_graph.style_attributes.get('graph', {}).get(style, {})
-            subgraph.graph_attr.update(style_attr)
+            subgraph = self._subgraphs.get(state)
+            subgraph.graph_attr.update(self._graph_styles.get(style, {}))
 
     def set_previous_transition(self, src, dst):
-        src = self._get_global_name(src.split(self.machine.state_cls.separator))
-        dst = self._get_global_name(dst.split(self.machine.state_cls.separator))
-        edge_attr = self.fsm_graph.style_attributes.get('edge', {}).get('previous', {}).copy()
+        src = self._get_global_state_name(src)
+        dst = self._get_global_state_name(dst)
+        edge_attr = self._edge_styles.get('previous', {}).copy()
         try:
             edge = self.fsm_graph.get_edge(src, dst)
         except KeyError:
             _src = src
             _dst = dst
-            if _get_subgraph(self.fsm_graph, 'cluster_' + src):
+            if self._subgraphs.get('cluster_' + src):
                 edge_attr['ltail'] = 'cluster_' + src
-            if _get_subgraph(self.fsm_graph, 'cluster_' + dst):
+            if self._subgraphs.get('cluster_' + dst):
                 edge_attr['lhead'] = "cluster_" + dst
             try:
                 edge = self.fsm_graph.get_edge(_src, _dst)
@@ -217,35 +264,7 @@ class NestedGraph(Graph):
         self.set_node_style(edge.attr.get("ltail") or src, 'previous')
 
 
-def _get_subgraph(graph, name):
-    """Searches for subgraphs in a graph.
-    Args:
-        g (AGraph): Container to be searched.
-        name (str): Name of the cluster.
-    Returns: AGraph if a cluster called 'name' exists else None
-    """
-    sub_graph = graph.get_subgraph(name)
-    if sub_graph:
-        return sub_graph
-    for sub in graph.subgraphs_iter():
-        sub_graph = _get_subgraph(sub, name)
-        if sub_graph:
-            return sub_graph
-    return None
-
-
 # the official copy method does not close the file handle
-# which causes ResourceWarnings
+# which causes ResourceWarnings; parse the serialized graph in memory instead
 def _copy_agraph(graph):
-    from tempfile import TemporaryFile  # pylint: disable=import-outside-toplevel; Only required for special cases
-
-    with TemporaryFile() as tmp:
-        if hasattr(tmp, "file"):
-            fhandle = tmp.file
-        else:
-            fhandle = tmp
-        graph.write(fhandle)
-        tmp.seek(0)
-        res = graph.__class__(filename=fhandle)
-        fhandle.close()
-    return res
+    return graph.__class__(string=graph.to_string())
@@ -1,5 +1,6 @@
-from typing import Any, List, Dict, Union, Optional
+from typing import Any, List, Dict, Literal, Union, Optional, Set, Tuple
 from logging import Logger
+from types import ModuleType
 
 from .diagrams_base import BaseGraph
 from ..core import ModelState
@@ -12,10 +13,16 @@ except ImportError:
         style_attributes: Dict[str, Union[str, Dict[str, Union[str, Dict[str, str]]]]]
 
 _LOGGER: Logger
+_pgv: Union[None, Literal[False], ModuleType]
+
+def _get_pgv() -> Optional[ModuleType]: ...
 
 
 class Graph(BaseGraph):
     fsm_graph: AGraph  # type: ignore[no-any-unimported]
+    _node_styles: Dict[str, Dict[str, str]]
+    _edge_styles: Dict[str, Dict[str, str]]
+    _graph_styles: Dict[str, Dict[str, str]]
     def _add_nodes(self, states: List[Dict[str, str]],  # type: ignore[no-any-unimported]
                    container: AGraph) -> None: ...
     def _add_edges(self, transitions: List[Dict[str, str]],  # type: ignore[no-any-unimported]
@@ -23,21 +30,26 @@ class Graph(BaseGraph):
     def generate(self) -> None: ...
     def get_graph(self, title: Optional[str] = ...,  # type: ignore[no-any-unimported]
                   roi_state: Optional[str] = ...) -> AGraph: ...
+    def _filter_graph(self, kept_nodes: Set[str],  # type: ignore[no-any-unimported]
+                      kept_edges: List[Tuple[str, str]]) -> AGraph: ...
     def set_node_style(self, state: ModelState, style: str) -> None: ...
     def set_previous_transition(self, src: str, dst: str) -> None: ...
     def reset_styling(self) -> None: ...
 
 
 class NestedGraph(Graph):
-    seen_transitions: Any
+    seen_transitions: Set[Any]
+    _subgraphs: Dict[str, AGraph]  # type: ignore[no-any-unimported]
     def __init__(self, *args: Any, **kwargs: Any) -> None: ...
+    def generate(self) -> None: ...
     def _add_nodes(self,  # type: ignore[override, no-any-unimported]
                    states: List[Dict[str, Union[str, List[Dict[str, str]]]]],
                    container: AGraph, prefix: str = ..., default_style: str = ...) -> None: ...
     def _add_edges(self, transitions: List[Dict[str, str]],  # type: ignore[no-any-unimported]
                    container: AGraph) -> None: ...
+    def _filter_graph(self, kept_nodes: Set[str],  # type: ignore[no-any-unimported]
+                      kept_edges: List[Tuple[str, str]]) -> AGraph: ...
     def set_node_style(self, state: ModelState, style: str) -> None: ...
     def set_previous_transition(self, src: str, dst: str) -> None: ...
 
-def _get_subgraph(graph: AGraph, name: str) -> Optional[AGraph]: ...  # type: ignore[no-any-unimported]
 def _copy_agraph(graph: AGraph) -> AGraph: ...  # type: ignore[no-any-unimported]
@@ -7,14 +7,10 @@
     factory object.
 """
 
-from functools import partial
-import itertools
-from six import iteritems
-
 from ..core import Machine, Transition
 
 from .nesting import HierarchicalMachine, NestedEvent, NestedTransition
-from .locking import LockedMachine
+from .locking import LockedMachine, LockedMethod
 from .diagrams import GraphMachine, NestedGraphTransition, HierarchicalGraphMachine
 
 try:
@@ -70,15 +66,20 @@ class LockedGraphMachine(GraphMachine, LockedMachine):
         A threadsafe machine with graph support.
     """
 
+    # GraphMachine and LockedMachine both customize pickling; combine their state handling
+    def __getstate__(self):
+        state = LockedMachine.__getstate__(self)
+        return {k: v for k, v in state.items() if k not in self._pickle_blacklist}
+
+    def __setstate__(self, state):
+        LockedMachine.__setstate__(self, state)
+        GraphMachine.__setstate__(self, {})
+
     @staticmethod
     def format_references(func):
-        if isinstance(func, partial) and func.func.__name__.startswith('_locked_method'):
-            return "%s(%s)" % (
-                func.args[0].__name__,
-                ", ".join(itertools.chain(
-                    (str(_) for _ in func.args[1:]),
-                    ("%s=%s" % (key, value)
-                     for key, value in iteritems(func.keywords if func.keywords else {})))))
+        # method wrappers created by LockedMachine
+        if isinstance(func, LockedMethod):
+            return "%s()" % func.__name__
         return GraphMachine.format_references(func)
 
 
@@ -90,6 +91,14 @@ class LockedHierarchicalGraphMachine(GraphMachine, LockedHierarchicalMachine):
     transition_cls = NestedGraphTransition
     event_cls = NestedEvent
 
+    def __getstate__(self):
+        state = LockedHierarchicalMachine.__getstate__(self)
+        return {k: v for k, v in state.items() if k not in self._pickle_blacklist}
+
+    def __setstate__(self, state):
+        LockedHierarchicalMachine.__setstate__(self, state)
+        GraphMachine.__setstate__(self, {})
+
     @staticmethod
     def format_references(func):
         return LockedGraphMachine.format_references(func)
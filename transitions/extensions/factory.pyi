@@ -2,7 +2,7 @@ from ..core import CallbackFunc, Machine, State
 from .diagrams import GraphMachine, NestedGraphTransition, HierarchicalGraphMachine
 from .locking import LockedMachine
 from .nesting import HierarchicalMachine, NestedEvent
-from typing import Any, Type, Dict, Tuple, Callable, Union
+from typing import Any, Type, Dict, Tuple, Union
 
 try:
     from transitions.extensions.asyncio import AsyncMachine, AsyncTransition
@@ -38,12 +38,16 @@ class LockedHierarchicalMachine(LockedMachine, HierarchicalMachine):  # type: ig
     def _get_qualified_state_name(self, state: State) -> str: ...
 
 class LockedGraphMachine(GraphMachine, LockedMachine):  # type: ignore
+    def __getstate__(self) -> Dict[str, Any]: ...
+    def __setstate__(self, state: Dict[str, Any]) -> None: ...
     @staticmethod
     def format_references(func: CallbackFunc) -> str: ...
 
 class LockedHierarchicalGraphMachine(GraphMachine, LockedHierarchicalMachine):  # type: ignore
     transition_cls: Type[NestedGraphTransition]
     event_cls: Type[NestedEvent]
+    def __getstate__(self) -> Dict[str, Any]: ...
+    def __setstate__(self, state: Dict[str, Any]) -> None: ...
     @staticmethod
     def format_references(func: CallbackFunc) -> str: ...
 
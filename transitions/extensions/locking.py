@@ -6,10 +6,10 @@
     Additionally, the user can inject her/his own context manager into the machine if required.
 """
 
-from collections import defaultdict
 from functools import partial
 from threading import Lock
-import inspect
+from types import MethodType
+from weakref import ref
 import warnings
 import logging
 
@@ -30,19 +30,32 @@ except ImportError:
     from threading import get_ident
 
     @contextmanager
-    def nested(*contexts):
-        """Reimplementation of nested in Python 3."""
+    def _nested_stack(*contexts):
         with ExitStack() as stack:
             for ctx in contexts:
                 stack.enter_context(ctx)
             yield contexts
 
+    @contextmanager
+    def _nested_pair(first, second):
+        with first, second:
+            yield first, second
+
+    def nested(*contexts):
+        """Reimplementation of nested in Python 3. Like `contextlib.nested`, the context manager yields the passed
+            contexts as a tuple. Two contexts are entered without an ExitStack."""
+        if len(contexts) == 2:
+            return _nested_pair(*contexts)
+        return _nested_stack(*contexts)
+
 
 class PicklableLock:
     """A wrapper for threading.Lock which discards its state during pickling and
         is reinitialized unlocked when unpickled.
     """
 
+    __slots__ = ('lock',)
+
     def __init__(self):
         self.lock = Lock()
 
@@ -53,23 +66,48 @@ class PicklableLock:
         return self.__init__()
 
     def __enter__(self):
-        self.lock.__enter__()
+        self.lock.acquire()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.lock.__exit__(exc_type, exc_val, exc_tb)
+        self.lock.release()
 
 
 class IdentManager:
-    """Manages the identity of threads to detect whether the current thread already has a lock."""
+    """Manages the identity of threads to detect whether the current thread already has a lock.
+        LockedMachine sets `current` directly after its contexts have been entered.
+    """
 
     def __init__(self):
         self.current = 0
 
-    def __enter__(self):
-        self.current = get_ident()
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.current = 0
+class LockedMethod:
+    """Calls a method of a LockedMachine with the machine's contexts entered.
+        The machine is only referenced weakly since LockedMachine keeps its wrapped methods.
+    """
+
+    __slots__ = ('machine', 'func', 'owner')
+
+    def __init__(self, machine, method):
+        self.machine = ref(machine)
+        self.func = method.__func__
+        # class methods are bound to the class which does not need to be referenced weakly
+        self.owner = None if method.__self__ is machine else method.__self__
+
+    @property
+    def __name__(self):
+        return self.func.__name__
+
+    def __reduce__(self):
+        # like bound methods, the wrapper is restored by looking up the method on the (unpickled) machine
+        return getattr, (self.machine(), self.func.__name__)
+
+    def __call__(self, *args, **kwargs):
+        machine = self.machine()
+        owner = self.owner
+        return machine._locked_method(  # pylint: disable=protected-access
+            self.func, machine if owner is None else owner, *args, **kwargs
+        )
 
 
 class LockedEvent(Event):
@@ -81,11 +119,13 @@ class LockedEvent(Event):
         # noinspection PyProtectedMember
         # LockedMachine._locked should not be called somewhere else. That's why it should not be exposed
         # to Machine users.
-        if self.machine._ident.current != get_ident():
-            with nested(*self.machine.model_context_map[id(model)]):
-                return super(LockedEvent, self).trigger(model, *args, **kwargs)
-        else:
+        machine = self.machine
+        thread_id = get_ident()
+        if machine._ident.current == thread_id:
             return super(LockedEvent, self).trigger(model, *args, **kwargs)
+        # models which are not (or no longer) registered are processed with the machine contexts only
+        contexts = machine.model_context_map.get(id(model)) or machine.machine_context
+        return machine._locked_call(thread_id, contexts, super(LockedEvent, self).trigger, model, *args, **kwargs)
 
 
 class LockedMachine(Machine):
@@ -106,10 +146,12 @@ class LockedMachine(Machine):
                  model_override=False, on_exception=None, on_final=None,
                  machine_context=None, **kwargs):
 
+        # wrapped public methods by name; see __getattribute__
+        self._locked_methods = {}
         self._ident = IdentManager()
+        # the thread holding the contexts is tracked by _ident which is not entered as a context itself
         self.machine_context = listify(machine_context) or [PicklableLock()]
-        self.machine_context.append(self._ident)
-        self.model_context_map = defaultdict(list)
+        self.model_context_map = {}
 
         super(LockedMachine, self).__init__(
             model=model, states=states, initial=initial, transitions=transitions,
@@ -128,12 +170,13 @@ class LockedMachine(Machine):
     def __getstate__(self):
         state = {k: v for k, v in self.__dict__.items()}
         del state['model_context_map']
+        state['_locked_methods'] = {}
         state['_model_context_map_store'] = {mod: self.model_context_map[id(mod)] for mod in self.models}
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
-        self.model_context_map = defaultdict(list)
+        self.model_context_map = {}
         for model in self.models:
             self.model_context_map[id(model)] = self._model_context_map_store[model]
         del self._model_context_map_store
@@ -150,10 +193,10 @@ class LockedMachine(Machine):
         model_context = listify(model_context) if model_context is not None else []
         super(LockedMachine, self).add_model(models, initial)
 
+        contexts = tuple(self.machine_context) + tuple(model_context)
         for mod in models:
             mod = self if mod is self.self_literal else mod
-            self.model_context_map[id(mod)].extend(self.machine_context)
-            self.model_context_map[id(mod)].extend(model_context)
+            self.model_context_map[id(mod)] = contexts
 
     def remove_model(self, model):
         """Extends `transitions.core.Machine.remove_model` by removing model specific context maps
@@ -168,9 +211,21 @@ class LockedMachine(Machine):
     def __getattribute__(self, item):
         get_attr = super(LockedMachine, self).__getattribute__
         tmp = get_attr(item)
-        if not item.startswith('_') and inspect.ismethod(tmp):
-            return partial(get_attr('_locked_method'), tmp)
-        return tmp
+        # only public methods are locked
+        if item[:1] == '_' or type(tmp) is not MethodType:  # pylint: disable=unidiomatic-typecheck
+            return tmp
+        try:
+            locked_methods = get_attr('_locked_methods')
+        except AttributeError:  # not initialized yet
+            locked_methods = {}
+        # public methods are wrapped once and the wrapper is reused as long as it calls the resolved method;
+        # a method that has been reassigned, deleted or patched on the class (e.g. by mock.patch) is wrapped again
+        locked = locked_methods.get(item)
+        owner = tmp.__self__
+        if locked is None or locked.func is not tmp.__func__ or \
+                locked.owner is not (None if owner is self else owner):
+            locked = locked_methods[item] = LockedMethod(self, tmp)
+        return locked
 
     def __getattr__(self, item):
         try:
@@ -178,15 +233,16 @@ class LockedMachine(Machine):
         except AttributeError:
             return super(LockedMachine, self).__getattr__(item)
 
-    # Determine if the returned method is a partial and make sure the returned partial has
+    # Determine if the returned method is a locked method or a partial and make sure the returned partial has
     # not been created by Machine.__getattr__.
     # https://github.com/tyarkoni/transitions/issues/214
     def _add_model_to_state(self, state, model):
         super(LockedMachine, self)._add_model_to_state(state, model)  # pylint: disable=protected-access
+        name = self._get_qualified_state_name(state)
         for prefix in self.state_cls.dynamic_methods:
-            callback = "{0}_{1}".format(prefix, self._get_qualified_state_name(state))
+            callback = "{0}_{1}".format(prefix, name)
             func = getattr(model, callback, None)
-            if isinstance(func, partial) and func.func != state.add_callback:
+            if isinstance(func, LockedMethod) or (isinstance(func, partial) and func.func != state.add_callback):
                 state.add_callback(prefix[3:], callback)
 
     # this needs to be overridden by the HSM variant to resolve names correctly
@@ -194,8 +250,19 @@ class LockedMachine(Machine):
         return state.name
 
     def _locked_method(self, func, *args, **kwargs):
-        if self._ident.current != get_ident():
-            with nested(*self.machine_context):
-                return func(*args, **kwargs)
-        else:
+        thread_id = get_ident()
+        if self._ident.current == thread_id:
             return func(*args, **kwargs)
+        return self._locked_call(thread_id, self.machine_context, func, *args, **kwargs)
+
+    def _locked_call(self, thread_id, contexts, func, *args, **kwargs):
+        """Enters `contexts` and marks the thread `thread_id` as their holder while `func` is called.
+            Callers pass calls from the thread already holding the contexts through before."""
+        ident = self._ident
+        # the default setup only has one lock which does not need a nested context
+        with contexts[0] if len(contexts) == 1 else nested(*contexts):
+            ident.current = thread_id
+            try:
+                return func(*args, **kwargs)
+            finally:
+                ident.current = 0
@@ -1,7 +1,8 @@
 from contextlib import AbstractContextManager
 from transitions.core import Event, Machine, ModelParameter, TransitionConfig, CallbacksArg, StateConfig
-from typing import Any, Dict, Literal, Optional, Type, List, DefaultDict, Union, Callable, Sequence
-from types import TracebackType
+from typing import Any, Dict, Literal, Optional, Type, List, Tuple, Union, Callable, Sequence
+from types import MethodType, TracebackType
+from weakref import ReferenceType
 from logging import Logger
 from threading import Lock
 from enum import Enum
@@ -21,12 +22,19 @@ class PicklableLock(LockContext):
     def __exit__(self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException],
                  exc_tb: Optional[TracebackType]) -> None: ...
 
-class IdentManager(LockContext):
+class IdentManager:
     current: int
     def __init__(self) -> None: ...
-    def __enter__(self) -> None: ...
-    def __exit__(self, exc_type: Optional[Type[BaseException]], exc_val: Optional[BaseException],
-                 exc_tb: Optional[TracebackType]) -> None: ...
+
+class LockedMethod:
+    machine: ReferenceType[LockedMachine]
+    func: Callable[..., Any]
+    owner: Optional[object]
+    @property
+    def __name__(self) -> str: ...
+    def __init__(self, machine: LockedMachine, method: MethodType) -> None: ...
+    def __reduce__(self) -> Tuple[Callable[..., Any], Tuple[Optional[LockedMachine], str]]: ...
+    def __call__(self, *args: Any, **kwargs: Any) -> Any: ...
 
 class LockedEvent(Event):
     machine: LockedMachine
@@ -35,9 +43,10 @@ class LockedEvent(Event):
 
 class LockedMachine(Machine):
     event_cls: Type[LockedEvent]
+    _locked_methods: Dict[str, LockedMethod]
     _ident: IdentManager
     machine_context: List[LockContext]
-    model_context_map: DefaultDict[int, List[LockContext]]
+    model_context_map: Dict[int, Tuple[LockContext, ...]]
     def __init__(self, model: Optional[ModelParameter] = ...,
                  states: Optional[Union[Sequence[StateConfig], Type[Enum]]] = ...,
                  initial: Optional[StateIdentifier] = ...,
@@ -62,3 +71,5 @@ class LockedMachine(Machine):
     def _add_model_to_state(self, state: State, model: object) -> None: ...
     def _get_qualified_state_name(self, state: State) -> str: ...
     def _locked_method(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any: ...
+    def _locked_call(self, thread_id: int, contexts: Sequence[LockContext], func: Callable[..., Any],
+                     *args: Any, **kwargs: Any) -> Any: ...
@@ -67,12 +67,9 @@ class MarkupMachine(Machine):
                 model_attribute=model_attribute, model_override=model_override,
                 on_exception=on_exception, on_final=on_final, **kwargs
             )
-            self._markup['before_state_change'] = [x for x in (rep(f) for f in self.before_state_change) if x]
-            self._markup['after_state_change'] = [x for x in (rep(f) for f in self.before_state_change) if x]
-            self._markup['prepare_event'] = [x for x in (rep(f) for f in self.prepare_event) if x]
-            self._markup['finalize_event'] = [x for x in (rep(f) for f in self.finalize_event) if x]
-            self._markup['on_exception'] = [x for x in (rep(f) for f in self.on_exception) if x]
-            self._markup['on_final'] = [x for x in (rep(f) for f in self.on_final) if x]
+            for key in ('before_state_change', 'after_state_change', 'prepare_event', 'finalize_event',
+                        'on_exception', 'on_final'):
+                self._markup[key] = [x for x in (rep(f) for f in getattr(self, key)) if x]
             self._markup['send_event'] = self.send_event
             self._markup['auto_transitions'] = self.auto_transitions
             self._markup['model_attribute'] = self.model_attribute
@@ -170,24 +167,33 @@ class MarkupMachine(Machine):
             root[key].append(s_def)
 
     def _convert_transitions(self, root):
-        root['transitions'] = []
+        root['transitions'] = transitions_markup = []
+        format_references = self.format_references
+        attributes = self.transition_attributes
         for event in self.events.values():
             if self._omit_auto_transitions(event):
                 continue
 
-            for transitions in event.transitions.items():
-                for trans in transitions[1]:
-                    t_def = _convert(trans, self.transition_attributes, self.format_references)
+            for transitions in event.transitions.values():
+                for trans in transitions:
+                    t_def = _convert(trans, attributes, format_references)
                     t_def['trigger'] = event.name
-                    con = [x for x in (rep(f.func, self.format_references) for f in trans.conditions
-                                       if f.target) if x]
-                    unl = [x for x in (rep(f.func, self.format_references) for f in trans.conditions
-                                       if not f.target) if x]
+                    # sort conditions and unless callbacks in a single pass
+                    con = []
+                    unl = []
+                    for cond in trans.conditions:
+                        ref = rep(cond.func, format_references)
+                        if not ref:
+                            continue
+                        if cond.target:
+                            con.append(ref)
+                        else:
+                            unl.append(ref)
                     if con:
                         t_def['conditions'] = con
                     if unl:
                         t_def['unless'] = unl
-                    root['transitions'].append(t_def)
+                    transitions_markup.append(t_def)
 
     def _add_markup_model(self, markup):
         initial = markup.get('state', None)
@@ -216,6 +222,9 @@ class MarkupMachine(Machine):
     def _is_auto_transition(self, event):
         if event.name.startswith('to_') and len(event.transitions) == len(self.states):
             state_name = event.name[len('to_'):]
+            # most auto transitions lead to states of the current scope; resolve other names (e.g. nested states)
+            if state_name in self.states:
+                return True
             try:
                 _ = self.get_state(state_name)
                 return True